@@ -0,0 +1,208 @@
+import csv
+import json
+import random
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import yaml
+
+# Steps per instruction file for each corpus size
+CORPUS_SIZES = {
+    'small': 12,
+    'medium': 400,
+    'huge': 20000,
+}
+
+# Files per kind for each synthetic repository size
+REPO_SIZES = {
+    'small': {'page_objects': 10, 'step_definitions': 10, 'features': 10},
+    'medium': {'page_objects': 100, 'step_definitions': 100, 'features': 100},
+    'huge': {'page_objects': 1000, 'step_definitions': 1000, 'features': 1000},
+}
+
+CSV_FIELDS = [
+    'step_description', 'api_endpoint', 'api_method', 'api_status', 'response_key',
+    'response_template', 'validation_type', 'validation_value', 'validation_selector',
+    'validation_assertion', 'test_data_source', 'test_data_field'
+]
+
+_ENTITIES = ['user', 'order', 'cart', 'invoice', 'product', 'account', 'payment', 'profile']
+_ACTIONS = ['open', 'create', 'update', 'delete', 'search', 'submit', 'review', 'export']
+
+TEST_DATA = {
+    'users': {
+        'valid': {'email': 'qa@example.com', 'password': 'secret', 'name': 'QA User'},
+        'admin': {'email': 'admin@example.com', 'password': 'admin', 'name': 'Admin'},
+    }
+}
+
+def _iter_rows(steps: int, seed: int) -> Iterator[Dict[str, str]]:
+    """Synthetic CSV rows: scenarios of one Given followed by When/And/Then steps"""
+    rng = random.Random(seed)
+    for index in range(steps):
+        entity = rng.choice(_ENTITIES)
+        action = rng.choice(_ACTIONS)
+        row = dict.fromkeys(CSV_FIELDS, '')
+        if index % 8 == 0:
+            row['step_description'] = f"Given I am on the {entity} page {index // 8}"
+            row['validation_type'] = 'url'
+            row['validation_value'] = f"/{entity}s"
+        elif index % 8 == 7:
+            row['step_description'] = f"Then I should see the {entity} {action} confirmation"
+            row['validation_type'] = 'element'
+            row['validation_value'] = f"{entity} {action}d"
+            row['validation_selector'] = f"[data-testid='{entity}-message']"
+            row['validation_assertion'] = 'toHaveText'
+        else:
+            keyword = 'When' if index % 8 == 1 else 'And'
+            row['step_description'] = f"{keyword} I {action} the {entity} {index}"
+            row['validation_selector'] = f"[data-testid='{entity}-{action}']"
+            row['validation_assertion'] = 'click'
+            if rng.random() < 0.4:
+                row['api_endpoint'] = f"/api/{entity}s/{action}"
+                row['api_method'] = rng.choice(['GET', 'POST', 'PUT'])
+                row['api_status'] = '200'
+                row['response_key'] = f"{entity}{action.title()}Response"
+                row['response_template'] = json.dumps(
+                    {'id': str(index), 'email': '{{users.valid.email}}', 'status': 'ok'}
+                )
+            if rng.random() < 0.3:
+                row['test_data_source'] = 'users.valid'
+                row['test_data_field'] = 'email'
+        yield row
+
+def _row_to_yaml_step(row: Dict[str, str]) -> Dict[str, Any]:
+    step: Dict[str, Any] = {'step': row['step_description']}
+    if row['api_endpoint']:
+        step['api_interceptions'] = [{
+            'endpoint': row['api_endpoint'],
+            'method': row['api_method'],
+            'status': int(row['api_status']),
+            'response_key': row['response_key'],
+            'response_template': json.loads(row['response_template']),
+        }]
+    if row['validation_type']:
+        validation = {'type': row['validation_type'], 'value': row['validation_value']}
+        if row['validation_type'] == 'element':
+            validation['selector'] = row['validation_selector']
+            validation['assertion'] = row['validation_assertion']
+        step['validations'] = [validation]
+    if row['test_data_source']:
+        step['test_data'] = {'source': row['test_data_source'], 'field': row['test_data_field']}
+    return step
+
+def write_csv_corpus(path: Path, steps: int, seed: int = 0) -> Path:
+    """Write a CSV instruction sheet with the given number of steps"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(_iter_rows(steps, seed))
+    return path
+
+def write_yaml_corpus(path: Path, steps: int, seed: int = 0) -> Path:
+    """Write a YAML instruction file with the given number of steps"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'feature_name': path.stem.replace('_', ' ').title(),
+        'steps': [_row_to_yaml_step(row) for row in _iter_rows(steps, seed)],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(document, f, sort_keys=False)
+    return path
+
+def build_corpora(root: Path, sizes: List[str], copies: int = 1) -> Dict[str, List[Path]]:
+    """Write CSV and YAML corpora under root/<size>/, returning the files per size"""
+    corpora = {}
+    for size in sizes:
+        files = []
+        for copy in range(copies):
+            seed = zlib.crc32(f"{size}:{copy}".encode('utf-8'))
+            files.append(write_csv_corpus(root / size / f"{size}_{copy}_csv.csv", CORPUS_SIZES[size], seed))
+            files.append(write_yaml_corpus(root / size / f"{size}_{copy}_yaml.yaml", CORPUS_SIZES[size], seed + 1))
+        corpora[size] = files
+    return corpora
+
+def write_test_data(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(TEST_DATA, indent=2))
+    return path
+
+_BASE_PAGE = '''import { Page } from '@playwright/test';
+
+export class BasePage {
+  constructor(protected page: Page) {}
+
+  async safeClick(selector: string) {
+    try {
+      await this.page.click(selector);
+    } catch (error) {
+      console.error(`Failed to click ${selector}`, error);
+      throw error;
+    }
+  }
+}
+'''
+
+def _page_object(name: str, entity: str) -> str:
+    return f'''import {{ BasePage }} from './basepage';
+
+export class {name} extends BasePage {{
+  readonly locators = {{
+    header: this.page.locator('[data-testid="{entity}-header"]'),
+    submitButton: this.page.locator('[data-testid="{entity}-submit"]'),
+    message: this.page.locator('[data-testid="{entity}-message"]'),
+  }};
+
+  async open{entity.title()}() {{
+    await this.page.goto(`/${{'{entity}'}}s`);
+  }}
+}}
+'''
+
+def _step_definition(name: str, entity: str, action: str) -> str:
+    return f'''import {{ Given, When, Then }} from '@cucumber/cucumber';
+
+When('I {action} the {entity} {{int}}', async function (id: number) {{
+  const responsePromise = this.page.waitForResponse(resp => resp.url().includes('/api/{entity}s/{action}'));
+  await this.page.click('[data-testid="{entity}-{action}"]');
+  const response = await responsePromise;
+  this.{entity}Response = await response.json();
+}});
+
+Then('I should see the {entity} {action} confirmation', async function () {{
+  await this.{name}.locators.message.waitFor();
+}});
+'''
+
+def _feature(entity: str, action: str, index: int) -> str:
+    return f'''Feature: {entity.title()} {action} {index}
+
+  Scenario: {action.title()} a {entity}
+    Given I am on the {entity} page {index}
+    When I {action} the {entity} {index}
+    Then I should see the {entity} {action} confirmation
+'''
+
+def build_repo(root: Path, size: str, seed: int = 0) -> Path:
+    """Write a synthetic Playwright-Cucumber repository for RepoContext"""
+    counts = REPO_SIZES[size]
+    rng = random.Random(seed)
+    src = root / 'src'
+    for directory in ('pages', 'step-definitions', 'features'):
+        (src / directory).mkdir(parents=True, exist_ok=True)
+
+    (src / 'pages' / 'basepage.ts').write_text(_BASE_PAGE)
+    for index in range(counts['page_objects']):
+        entity = rng.choice(_ENTITIES)
+        name = f"{entity.title()}Page{index}"
+        (src / 'pages' / f"{entity}{index}.page.ts").write_text(_page_object(name, entity))
+    for index in range(counts['step_definitions']):
+        entity, action = rng.choice(_ENTITIES), rng.choice(_ACTIONS)
+        (src / 'step-definitions' / f"{entity}{index}.steps.ts").write_text(
+            _step_definition(f"{entity}Page", entity, action)
+        )
+    for index in range(counts['features']):
+        entity, action = rng.choice(_ENTITIES), rng.choice(_ACTIONS)
+        (src / 'features' / f"{entity}{index}.feature").write_text(_feature(entity, action, index))
+    return root
@@ -0,0 +1,303 @@
+"""Offline benchmarks for the test generator
+
+Runs every scenario against synthetic corpora and repositories with the fake
+LLM provider, so no API keys or network access are needed:
+
+    python -m benchmarks.run --sizes small medium --output results.json
+    python -m benchmarks.run --baseline results.json
+
+Each scenario runs in a fresh process so its peak RSS is measured on its own.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List
+import yaml
+
+from benchmarks.corpora import CORPUS_SIZES, build_corpora, build_repo, write_test_data
+
+SCENARIOS = ('instructions', 'generate', 'repo')
+BASE_PROMPT = Path(__file__).resolve().parent.parent / 'prompts' / 'base_prompt.md'
+
+# Metrics compared against a baseline and whether larger values are better
+COMPARED_METRICS = {
+    'files_per_sec': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+    'limiter_wait_ms': False,
+}
+
+REPO_QUERIES = [
+    'waitForResponse', 'locators message', 'user submit', 'order confirmation',
+    'cart page', 'try catch', 'payment export', 'click data-testid',
+]
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of values (q in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _latency_metrics(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+    }
+
+def _bench_instructions(work_dir: Path, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse, validate and build prompts for every file of a corpus"""
+    from utils.instruction_processor import InstructionProcessor
+    from utils.prompt_builder import PromptBuilder
+
+    corpus = build_corpora(work_dir / 'corpora', [size], options['copies'])[size]
+    test_data = write_test_data(work_dir / 'test_data.json')
+    base_prompt = BASE_PROMPT.read_text()
+
+    latencies = []
+    prompts = 0
+    started = time.perf_counter()
+    for path in corpus:
+        start = time.perf_counter()
+        processor = InstructionProcessor(path, test_data)
+        processor.validate()
+        prompts += len(PromptBuilder(base_prompt, model='fake', context_window=options['context_window']).build(processor))
+        latencies.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'files': len(corpus),
+        'steps': len(corpus) * CORPUS_SIZES[size],
+        'prompts': prompts,
+        'seconds': round(elapsed, 3),
+        'files_per_sec': round(len(corpus) / elapsed, 2),
+        **_latency_metrics(latencies),
+    }
+
+def _write_config(work_dir: Path, options: Dict[str, Any]) -> Path:
+    config_dir = work_dir / 'config'
+    config_dir.mkdir(parents=True, exist_ok=True)
+    config = {
+        'base_prompt_file': str(BASE_PROMPT),
+        'provider': 'fake',
+        'fake': {
+            'latency_ms': options['latency_ms'],
+            'latency_jitter_ms': options['latency_jitter_ms'],
+            'error_rate': options['error_rate'],
+            'files_per_response': options['files_per_response'],
+            'lines_per_file': options['lines_per_file'],
+            'context_window': options['context_window'],
+            'max_concurrency': options['workers'],
+            **({'requests_per_minute': options['requests_per_minute']} if options['requests_per_minute'] else {}),
+            'retry_attempts': 3,
+            'retry_delay': 0.01,
+        },
+        'prompt': {'compact': True},
+        'cache': {'enabled': False},
+    }
+    (config_dir / 'config.yaml').write_text(yaml.safe_dump(config, sort_keys=False))
+    return config_dir
+
+def _bench_generate(work_dir: Path, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run batch generation end to end against the fake provider"""
+    from main import TestGenerator
+
+    corpus_dir = work_dir / 'corpora' / size
+    build_corpora(work_dir / 'corpora', [size], options['copies'])
+    test_data = write_test_data(work_dir / 'test_data.json')
+    output_dir = work_dir / 'generated' / size
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        generator = TestGenerator(_write_config(work_dir, options), use_cache=False)
+        started = time.perf_counter()
+        results = generator.generate_batch(str(corpus_dir), output_dir, options['workers'], test_data)
+        elapsed = time.perf_counter() - started
+
+    records = generator.telemetry.records
+    files = sum(record.get('files', 0) for record in records if record['span'] == 'write_files')
+    llm_latencies = [record['duration_ms'] for record in records
+                     if record['span'] in ('llm.generate_completion', 'llm.generate_completions')]
+    return {
+        'instruction_files': len(results),
+        'failed': sum(1 for error in results.values() if error),
+        'files': files,
+        'llm_calls': len(llm_latencies),
+        'retries': sum(record.get('retries', 0) for record in records
+                       if record['span'] in ('llm.generate_test', 'llm.generate_tests')),
+        # Time spent waiting on the shipped rate limiter, summed over calls
+        'limiter_wait_ms': sum(record.get('limiter_wait_ms', 0) for record in records
+                               if record['span'] in ('llm.generate_test', 'llm.generate_tests')),
+        'seconds': round(elapsed, 3),
+        'files_per_sec': round(files / elapsed, 2),
+        # End-to-end latency per instruction file
+        **_latency_metrics([record['duration_ms'] for record in records if record['span'] == 'generate_tests']),
+        'llm_p50_ms': round(percentile(llm_latencies, 50), 2),
+        'llm_p99_ms': round(percentile(llm_latencies, 99), 2),
+        'prompt_cache_hit_rate': round((generator.telemetry.prompt_cache_summary() or {}).get('hit_rate', 0.0), 3),
+    }
+
+def _bench_repo(work_dir: Path, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Load a synthetic repository cold and from snapshot, then run similarity queries"""
+    from utils.repo_loader import RepoContext
+
+    repo = build_repo(work_dir / 'repos' / size, size)
+    snapshot = work_dir / 'repos' / f"{size}.snapshot.json"
+
+    # The cold load starts without a snapshot and writes the one the warm load reads
+    snapshot.unlink(missing_ok=True)
+    started = time.perf_counter()
+    context = RepoContext(repo, snapshot_path=snapshot, use_snapshot=True)
+    cold = time.perf_counter() - started
+    files = 1 + len(context.page_objects) + len(context.step_definitions) + len(context.features)
+    if not snapshot.is_file():
+        raise Exception(f"Cold load did not write a snapshot: {snapshot}")
+
+    started = time.perf_counter()
+    context = RepoContext(repo, snapshot_path=snapshot, use_snapshot=True)
+    warm = time.perf_counter() - started
+    if context.changed_files:
+        raise Exception(f"Warm load rescanned {len(context.changed_files)} file(s)")
+
+    # Built on the first query; timed apart so it does not skew query latency
+    started = time.perf_counter()
+    context.index
+    index_build = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(options['queries']):
+        for query in REPO_QUERIES:
+            start = time.perf_counter()
+            context.find_similar_examples(query, top_k=10)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'files': files,
+        'cold_load_ms': round(cold * 1000, 2),
+        'warm_load_ms': round(warm * 1000, 2),
+        'index_build_ms': round(index_build * 1000, 2),
+        'files_per_sec': round(files / cold, 2),
+        # Similarity query latency
+        **_latency_metrics(latencies),
+    }
+
+_BENCHMARKS = {
+    'instructions': _bench_instructions,
+    'generate': _bench_generate,
+    'repo': _bench_repo,
+}
+
+def run_scenario(scenario: str, size: str, work_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one scenario in the current process and attach its peak RSS"""
+    result = _BENCHMARKS[scenario](Path(work_dir) / f"{scenario}_{size}", size, options)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+def run_isolated(scenario: str, size: str, work_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one scenario in a fresh interpreter so peak RSS is not shared between scenarios"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(run_scenario, scenario, size, work_dir, options).result()
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    """Print metric deltas against a baseline and return the regressions"""
+    regressions = []
+    print(f"\n{'benchmark':<24}{'metric':<16}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in result or metric not in previous:
+                continue
+            old, new = previous[metric], result[metric]
+            if not old and not new:
+                continue
+            # A metric leaving zero, such as limiter waits appearing, counts as an unbounded change
+            delta = (new - old) / old if old else float('inf')
+            worse = -delta if higher_is_better else delta
+            flag = ""
+            if worse > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{key} {metric}: {old} -> {new}")
+            print(f"{key:<24}{metric:<16}{old:>12}{new:>12}{delta:>+10.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline generator benchmarks with a fake LLM provider")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Scenarios to run")
+    parser.add_argument("--sizes", nargs="+", choices=list(CORPUS_SIZES), default=['small', 'medium'],
+                        help="Corpus and repository sizes")
+    parser.add_argument("--copies", type=int, default=4,
+                        help="CSV/YAML file pairs per corpus size")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Batch workers and fake provider concurrency")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake provider latency")
+    parser.add_argument("--latency-jitter-ms", type=float, default=20, help="Fake provider latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake provider calls failing")
+    parser.add_argument("--files-per-response", type=int, default=3, help="Files in each fake response")
+    parser.add_argument("--lines-per-file", type=int, default=40, help="Lines in each fake file")
+    parser.add_argument("--context-window", type=int, default=128000, help="Context window used to split prompts")
+    parser.add_argument("--requests-per-minute", type=float,
+                        help="Rate limit for the fake provider (default: the shipped limiter defaults)")
+    parser.add_argument("--queries", type=int, default=25, help="Rounds of repository similarity queries")
+    parser.add_argument("--work-dir", type=str, help="Directory for synthetic inputs (default: temporary)")
+    parser.add_argument("--output", type=str, help="Write results as JSON (use as a later --baseline)")
+    parser.add_argument("--baseline", type=str, help="Compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    options = {
+        'copies': args.copies,
+        'workers': args.workers,
+        'latency_ms': args.latency_ms,
+        'latency_jitter_ms': args.latency_jitter_ms,
+        'error_rate': args.error_rate,
+        'files_per_response': args.files_per_response,
+        'lines_per_file': args.lines_per_file,
+        'context_window': args.context_window,
+        'requests_per_minute': args.requests_per_minute,
+        'queries': args.queries,
+    }
+
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='bench-'))
+        results = {}
+        for scenario in args.scenarios:
+            for size in args.sizes:
+                key = f"{scenario}:{size}"
+                print(f"Running {key}...")
+                results[key] = run_isolated(scenario, size, work_dir, options)
+                print(f"  {json.dumps(results[key])}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'options': options, 'results': results}, indent=2))
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✓ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,629 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+import glob
+import subprocess
+import sys
+import threading
+import time
 import yaml
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Tuple
 from utils.llm import LLMHandler
-from utils.instruction_processor import process_instructions
+from utils.instruction_processor import InstructionProcessor, iter_scenarios
+from utils.build_manifest import BuildManifest, fingerprint, scenario_keys
+from utils.prompt_builder import PromptBuilder, merge_file_sets
+from utils.telemetry import Telemetry
+from utils.completion_cache import CompletionCache
+from utils.step_matcher import StepMatcher
+from utils.job_queue import JobQueue, default_worker_id, parse_shard
+from utils.output_writer import OutputWriter
 
 class TestGenerator:
     """Prompt-based test generator"""
     
-    def __init__(self, config_path: Path):
+    def __init__(self, config_path: Path, use_cache: bool = True, stream: bool = False, full: bool = False):
         self.config_path = config_path
+        self.use_cache = use_cache
+        self.stream = stream
+        self.full = full
+        self.telemetry = Telemetry()
         self.config = self._load_config()
-        self.llm_handler = LLMHandler(self.config)
+        self._llm_handler = None
+        self._llm_handler_lock = threading.Lock()
+        self._base_prompt = None
+        self._step_matcher = None
+        self._step_matcher_lock = threading.Lock()
+
+    @property
+    def llm_handler(self) -> LLMHandler:
+        """LLM handler, created on first use so validation and cache commands never build a provider"""
+        with self._llm_handler_lock:
+            if self._llm_handler is None:
+                from config import load_env
+                load_env()
+                self._llm_handler = LLMHandler(self.config, telemetry=self.telemetry)
+            return self._llm_handler
     
+    @property
+    def step_matcher(self) -> StepMatcher | None:
+        """Matcher over the repository's existing step definitions, or None when step reuse is off"""
+        reuse_config = self.config.get("step_reuse") or {}
+        if not reuse_config.get("enabled", False):
+            return None
+        with self._step_matcher_lock:
+            if self._step_matcher is None:
+                from utils.repo_loader import RepoContext
+                with self.telemetry.span("load_step_definitions") as span:
+                    # Lazy mode reads only the step definitions, reusing the repo snapshot
+                    context = RepoContext(reuse_config.get("repo_path", ".."), load_mode='lazy')
+                    self._step_matcher = StepMatcher(context.step_definitions)
+                    span["definitions"] = len(self._step_matcher)
+            return self._step_matcher
+
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from config file"""
-        with open(self.config_path / 'config.yaml') as f:
-            return yaml.safe_load(f)
+        with self.telemetry.span("load_config"):
+            with open(self.config_path / 'config.yaml') as f:
+                return yaml.safe_load(f)
     
     def _load_base_prompt(self) -> str:
-        """Load and validate base prompt"""
-        base_prompt_path = Path(self.config["base_prompt_file"])
-        if not base_prompt_path.exists():
-            raise FileNotFoundError(f"Base prompt file not found: {base_prompt_path}")
-        return base_prompt_path.read_text()
+        """Load and validate base prompt (read once per generator)"""
+        if self._base_prompt is not None:
+            return self._base_prompt
+        with self.telemetry.span("load_base_prompt"):
+            base_prompt_path = Path(self.config["base_prompt_file"])
+            if not base_prompt_path.exists():
+                raise FileNotFoundError(f"Base prompt file not found: {base_prompt_path}")
+            self._base_prompt = base_prompt_path.read_text()
+        return self._base_prompt
     
-    def generate_tests(self, instructions_file: Path, output_dir: Path):
-        """Generate tests based on instructions"""
-        # Load test instructions
-        with open(instructions_file) as f:
-            instructions = yaml.safe_load(f)
-        
+    def _model_settings(self) -> Dict[str, Any]:
+        """Model settings as configured (llm section overridden by the provider's), without building a provider"""
+        provider_name = self.config.get("provider", "openai").lower()
+        return {**(self.config.get("llm") or {}), **(self.config.get(provider_name) or {})}
+
+    def _prompt_builder(self, base_prompt: str, params: Dict[str, Any] | None = None) -> PromptBuilder:
+        """Create a prompt builder sized for the model in params, or the configured one"""
+        settings = self._model_settings()
+        params = params or settings
+        prompt_config = self.config.get("prompt") or {}
+        return PromptBuilder(
+            base_prompt,
+            model=params.get("model"),
+            context_window=settings.get("context_window"),
+            reserve_tokens=params.get("max_tokens") or params.get("max_output_tokens") or 4000,
+            compact=prompt_config.get("compact", True)
+        )
+
+    def generate_tests(self, instructions_file: Path, output_dir: Path, test_data_path: Path | None = None,
+                       on_file: Callable[[Path, str], None] | None = None):
+        """Generate tests based on instructions
+
+        Args:
+            on_file: Optional callback(path, content) invoked for every output file
+                as soon as it is written (or found unchanged)
+        """
+        with self.telemetry.span("generate_tests", feature=Path(instructions_file).stem):
+            self._generate_tests(instructions_file, output_dir, test_data_path, on_file)
+
+    def _generate_tests(self, instructions_file: Path, output_dir: Path, test_data_path: Path | None,
+                        on_file: Callable[[Path, str], None] | None = None):
         # Load base prompt
         base_prompt = self._load_base_prompt()
+        prompt_config = self.config.get("prompt") or {}
         
-        # Process instructions into a format matching base prompt
-        processed_instructions = process_instructions(instructions_file)
+        # Process instructions into a format matching base prompt; the parsed
+        # model is cached per path and mtime and shared by every later stage
+        with self.telemetry.span("process_instructions") as span:
+            processor = InstructionProcessor(
+                instructions_file,
+                test_data_path,
+                stream=prompt_config.get("stream_instructions", False),
+                step_matcher=self.step_matcher
+            )
+            
+            # Reject malformed instructions before paying for an LLM round-trip
+            processor.validate()
+            # Every prompt starts with the base prompt; providers cache it as a shared prefix
+            self.llm_handler.prompt_prefix = base_prompt
+            builder = self._prompt_builder(base_prompt, self.llm_handler.provider.sampling_params())
+            if processor.step_matcher is not None:
+                total = reused = 0
+                for step in processor.iter_steps():
+                    total += 1
+                    reused += bool(processor.implemented_by(step))
+                span["reused_steps"] = reused
+                print(f"Reusing {reused} of {total} step(s) already implemented in the repository")
         
-        # Build complete prompt
-        prompt = f"{base_prompt}\n\nTest Instructions:\n{processed_instructions}"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if prompt_config.get("incremental", True):
+            self._generate_incremental(processor, builder, base_prompt, Path(instructions_file).name, output_dir, on_file)
+            return
+        
+        # Build size-aware prompts, split by scenario if they would overflow the context window
+        with self.telemetry.span("build_prompts") as span:
+            prompts = builder.build(processor)
+            span["prompts"] = len(prompts)
+            span["prompt_tokens"] = sum(builder.section_tokens.values())
+        print(f"Prompt tokens: {builder.section_tokens} across {len(prompts)} prompt(s)")
         
         # Generate test code using LLM
         print("Generating tests using LLM...")
-        response = self.llm_handler.generate_test(prompt)
+        if self.stream and len(prompts) == 1:
+            # Write each file as soon as its closing fence arrives
+            files = self.llm_handler.generate_test_stream(prompts[0], use_cache=self.use_cache)
+        else:
+            files = self._generate_files(prompts).items()
+        self._write_files(output_dir, files, on_file)
+
+    def _generate_files(self, prompts: List[str]) -> Dict[str, str]:
+        """Generate and merge the files for a sequence of prompts"""
+        responses = self.llm_handler.generate_tests(prompts, use_cache=self.use_cache)
+        with self.telemetry.span("parse_response"):
+            return merge_file_sets([self.llm_handler.parse_response(response) for response in responses])
+
+    def _generate_incremental(self, processor: InstructionProcessor, builder: PromptBuilder,
+                              base_prompt: str, source: str, output_dir: Path,
+                              on_file: Callable[[Path, str], None] | None = None):
+        """Regenerate only the groups of step runs whose inputs changed since the last run
+
+        Scenarios are split into runs of steps (see PromptBuilder.split_scenarios).
+        Unchanged groups reuse the file fragments recorded in the output directory's
+        build manifest; all fragments are merged again in instruction order.
+        """
+        prompt_config = self.config.get("prompt") or {}
+        manifest = BuildManifest(output_dir)
         
-        # Parse and save generated files
-        output_dir.mkdir(parents=True, exist_ok=True)
-        for filename, content in self.llm_handler.parse_response(response).items():
-            output_file = output_dir / filename
-            output_file.write_text(content)
-            print(f"✓ Generated test file: {output_file}")
+        group_tokens = prompt_config.get("incremental_group_tokens", 4000)
+        with self.telemetry.span("plan_incremental") as span:
+            # Scenarios are split into runs of steps so an edit only regenerates its own run
+            runs = builder.split_scenarios(processor, iter_scenarios(processor.iter_steps()), group_tokens)
+            scenarios = [steps for steps, _ in runs]
+            resumes = {index for index, (_, continues) in enumerate(runs) if continues}
+            settings = fingerprint(
+                base_prompt,
+                self.llm_handler.provider_name,
+                self.llm_handler.provider.sampling_params(),
+                prompt_config.get("compact", True),
+                processor.format_header(),
+                processor.format_global_interceptions()
+            )
+            keys = scenario_keys(processor, scenarios)
+            if self.full:
+                reused, pending = [], list(range(len(scenarios)))
+            else:
+                reused, pending = manifest.plan(source, settings, keys)
+            changed = manifest.changed(source, settings, keys)
+            
+            # Only adjacent runs share a group, so merged fragments stay in instruction order
+            blocks: List[List[int]] = []
+            for index in pending:
+                if blocks and blocks[-1][-1] == index - 1:
+                    blocks[-1].append(index)
+                else:
+                    blocks.append([index])
+            groups = []
+            for block in blocks:
+                for positions in builder.group_scenarios(processor, [scenarios[index] for index in block], group_tokens):
+                    indices = [block[position] for position in positions]
+                    groups.append({"indices": indices, "scenarios": [keys[index] for index in indices], "lead": 0 in indices})
+            span["scenarios"] = len(scenarios)
+            span["reused"] = len(scenarios) - len(pending)
+            span["changed"] = len(changed)
+            span["pending"] = len(pending)
+        # Unchanged runs are regenerated too when the group they were generated in can no longer be reused
+        print(f"{len(changed)} of {len(scenarios)} step run(s) changed; "
+              f"regenerating {len(pending)} run(s) in {len(groups)} group(s)")
+        
+        if groups:
+            print("Generating tests using LLM...")
+        group_prompts = []
+        for group in groups:
+            group_prompts.append(builder.build_group(
+                processor,
+                [scenarios[index] for index in group["indices"]],
+                continuation=not group["lead"],
+                resume=group["indices"][0] in resumes
+            ))
+            print(f"Prompt tokens: {builder.section_tokens} across {len(group_prompts[-1])} prompt(s)")
+        
+        streamed = False
+        if self.stream and len(groups) == 1 and len(group_prompts[0]) == 1 and not reused:
+            # Nothing to merge with: write each file as soon as its closing fence arrives
+            groups[0]["files"] = {}
+            stream = self.llm_handler.generate_test_stream(group_prompts[0][0], use_cache=self.use_cache)
+            self._write_files(output_dir, self._collect(stream, groups[0]["files"]), on_file)
+            streamed = True
+        elif groups:
+            # Every changed group goes to the provider as one batch
+            responses = iter(self.llm_handler.generate_tests(
+                [prompt for prompts in group_prompts for prompt in prompts],
+                use_cache=self.use_cache
+            ))
+            with self.telemetry.span("parse_response"):
+                for group, prompts in zip(groups, group_prompts):
+                    group["files"] = merge_file_sets([
+                        self.llm_handler.parse_response(next(responses)) for _ in prompts
+                    ])
+        
+        ordered = sorted(reused + groups, key=lambda group: min(group["indices"], default=0))
+        with self.telemetry.span("parse_response"):
+            files = merge_file_sets([group["files"] for group in ordered])
+        if not streamed:
+            # A streamed group is the whole file set and has been written already
+            self._write_files(output_dir, files.items(), on_file)
+        for path in manifest.stale_outputs(source, files):
+            path.unlink()
+            print(f"✓ Removed stale test file: {path}")
+        manifest.record(source, settings, ordered, files)
+        manifest.save()
+
+    @staticmethod
+    def _collect(files, collected: Dict[str, str]):
+        """Pass (filename, content) pairs through while recording them"""
+        for filename, content in files:
+            collected[filename] = content
+            yield filename, content
+
+    def _write_files(self, output_dir: Path, files, on_file: Callable[[Path, str], None] | None = None):
+        """Write generated files atomically, leaving files whose content is unchanged untouched"""
+        output_config = self.config.get("output") or {}
+        with self.telemetry.span("write_files") as span:
+            writer = OutputWriter(
+                max_workers=output_config.get("write_workers", 4),
+                fsync=output_config.get("fsync", True)
+            )
+            pending = []
+
+            def report(block: bool):
+                # Report finished writes in order, as soon as each one is done
+                while pending and (block or pending[0][2].done()):
+                    output_file, content, future = pending.pop(0)
+                    if future.result():
+                        print(f"✓ Generated test file: {output_file}")
+                    if on_file:
+                        on_file(output_file, content)
+
+            with writer:
+                for filename, content in files:
+                    output_file = output_dir / filename
+                    pending.append((output_file, content, writer.write(output_file, content)))
+                    report(block=False)
+                report(block=True)
+            span["files"] = writer.written
+            span["unchanged"] = writer.unchanged
+        if writer.written or writer.unchanged:
+            print(f"✓ {writer.written} file(s) written, {writer.unchanged} unchanged in {output_dir}")
+
+    def validate(self, instruction_files: List[Path]) -> Dict[Path, Exception | None]:
+        """Validate instruction files against the schema without touching the LLM"""
+        results = {}
+        for path in instruction_files:
+            try:
+                InstructionProcessor(path).validate()
+                results[path] = None
+            except Exception as e:
+                results[path] = e
+        return results
+
+    def render_prompts(self, instructions_file: Path, test_data_path: Path | None = None) -> List[str]:
+        """Build the prompts an instruction file would send, without creating an LLM client"""
+        processor = InstructionProcessor(instructions_file, test_data_path, step_matcher=self.step_matcher)
+        processor.validate()
+        return self._prompt_builder(self._load_base_prompt()).build(processor)
+
+    def completion_cache(self) -> CompletionCache:
+        """Completion cache as configured, without constructing the LLM handler"""
+        return CompletionCache.from_config(self.config.get("cache") or {})
+
+    def generate_batch(self, instructions: str, output_dir: Path, max_workers: int = 4,
+                       test_data_path: Path | None = None) -> Dict[Path, Exception | None]:
+        """Generate tests for every instruction file matched by a directory or glob
+
+        Each instruction file gets its own subdirectory under output_dir, named by
+        its path below the directory or glob root (see output_names). Files run
+        on a bounded worker pool; the LLM handler additionally caps in-flight
+        provider requests. Returns a mapping of instruction file to error (None on success).
+        """
+        instruction_files = find_instruction_files(instructions)
+        if not instruction_files:
+            raise FileNotFoundError(f"No instruction files found: {instructions}")
+
+        # Fail fast on a missing base prompt before fanning out
+        self._load_base_prompt()
+
+        names = output_names(instructions, instruction_files)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(self.generate_tests, path, output_dir / names[path], test_data_path): path
+                for path in instruction_files
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    future.result()
+                    results[path] = None
+                except Exception as e:
+                    print(f"❌ Failed to generate tests for {path}: {str(e)}")
+                    results[path] = e
+        return results
+
+INSTRUCTION_SUFFIXES = ('.yaml', '.yml', '.csv')
+
+def find_instruction_files(instructions: str) -> List[Path]:
+    """Resolve a directory or glob pattern into a sorted list of instruction files"""
+    path = Path(instructions)
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(instructions, recursive=True))
+    return sorted(
+        p for p in candidates
+        if p.is_file() and p.suffix.lower() in INSTRUCTION_SUFFIXES
+    )
+
+def _glob_root(instructions: str) -> Path:
+    """Directory an instruction directory or glob pattern is resolved from"""
+    path = Path(instructions)
+    if path.is_dir():
+        return path
+    parts = []
+    for part in path.parts:
+        if any(char in part for char in '*?['):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path('.')
+
+def output_names(instructions: str, instruction_files: List[Path]) -> Dict[Path, str]:
+    """
+    Output subdirectory of each instruction file: its path below the directory
+    or glob root without the suffix, so team1/login.csv and team2/login.csv
+    write to team1/login and team2/login instead of sharing login/
+    """
+    root = _glob_root(instructions).resolve()
+    names, owners = {}, {}
+    for path in instruction_files:
+        resolved = path.resolve()
+        try:
+            name = resolved.relative_to(root).with_suffix('').as_posix()
+        except ValueError:
+            name = path.stem
+        if name in owners:
+            raise ValueError(f"{owners[name]} and {path} would both be generated into {name}/; rename one of them")
+        names[path] = name
+        owners[name] = path
+    return names
+
+def run_validate(generator: TestGenerator, instruction_files: List[Path]):
+    """Validate instruction files and report each one"""
+    if not instruction_files:
+        raise FileNotFoundError("No instruction files found")
+    results = generator.validate(instruction_files)
+    for path, error in results.items():
+        if error:
+            print(f"❌ {error}")
+        else:
+            print(f"✓ {path} is valid")
+    failed = [path for path, error in results.items() if error]
+    if failed:
+        raise Exception(f"{len(failed)} of {len(results)} instruction files are invalid")
+
+def run_cache_command(cache: CompletionCache, clear: bool):
+    """Print completion cache statistics, optionally clearing it first"""
+    if clear:
+        cache.clear()
+        print(f"✓ Cleared completion cache: {cache.cache_dir}")
+    stats = cache.stats()
+    print(f"Completion cache: {stats['dir']}")
+    print(f"  Entries: {stats['entries']} ({stats['expired']} expired)")
+    print(f"  Size: {stats['bytes'] / (1024 * 1024):.2f} MB")
+    if stats['oldest'] is not None:
+        print(f"  Oldest: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats['oldest']))}")
+        print(f"  Newest: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats['newest']))}")
+
+def run_trace_ingest(traces: str, output: Path, config: Dict[str, Any], max_workers: int):
+    """Derive API interception rows from Playwright traces and write them as a CSV sheet"""
+    from utils.trace_loader import find_trace_files, interception_rows, load_traces, write_interceptions_csv
+
+    trace_files = find_trace_files(traces)
+    if not trace_files:
+        raise FileNotFoundError(f"No trace archives found: {traces}")
+    trace_config = dict(config.get('traces') or {})
+    max_workers = trace_config.pop('workers', None) or max_workers
+    results = load_traces(trace_files, trace_config, max_workers=max_workers)
+    for result in results:
+        print(f"✓ {result['trace']}: {result['entries']} network entries, {result['api_calls']} API calls, "
+              f"{len(result['interceptions'])} unique")
+    rows = interception_rows(results)
+    write_interceptions_csv(rows, output)
+    print(f"✓ Wrote {len(rows)} interception(s) to {output}")
+
+def run_worker(generator: TestGenerator, queue: JobQueue, worker: str, shard: Tuple[int, int] | None,
+               heartbeat_seconds: float, poll_seconds: float) -> int:
+    """Claim and generate queued jobs until every job is finished; returns the number completed"""
+    completed = 0
+    while True:
+        lease = queue.claim(worker, shard)
+        if lease is None:
+            if queue.finished():
+                return completed
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{worker}] Generating {lease.job_id} (attempt {lease.attempt})")
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(heartbeat_seconds) and queue.heartbeat(lease):
+                pass
+
+        heartbeat = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat.start()
+        staging = queue.staging_dir(lease)
+        try:
+            started = time.perf_counter()
+            job = lease.job
+            generator.generate_tests(Path(job['instructions']), staging,
+                                     Path(job['test_data']) if job['test_data'] else None)
+            stop.set()
+            # complete() re-checks the lease, so a result finished after losing it is discarded
+            if queue.complete(lease, staging, {'seconds': round(time.perf_counter() - started, 3)}):
+                completed += 1
+                print(f"[{worker}] ✓ {lease.job_id}")
+            else:
+                print(f"[{worker}] ❌ Lost the lease on {lease.job_id}; result discarded")
+        except Exception as e:
+            stop.set()
+            print(f"[{worker}] ❌ {lease.job_id} failed: {str(e)}")
+            queue.fail(lease, e, staging)
+        finally:
+            heartbeat.join()
+
+def run_coordinator(queue: JobQueue, config_dir: Path, instructions: str, output_dir: Path,
+                    test_data_path: Path | None, local_workers: int, poll_seconds: float):
+    """Enqueue instruction files, optionally start local workers, and merge results as jobs finish"""
+    instruction_files = find_instruction_files(instructions)
+    if not instruction_files:
+        raise FileNotFoundError(f"No instruction files found: {instructions}")
+    queue.enqueue(output_names(instructions, instruction_files), output_dir, test_data_path)
+    print(f"✓ Queued {len(instruction_files)} job(s) in {queue.root}")
+
+    processes = [
+        subprocess.Popen([
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--queue", str(queue.root), "--config", str(config_dir),
+            "--shard", f"{index}/{local_workers}"
+        ])
+        for index in range(local_workers)
+    ]
+    try:
+        last_status = None
+        while True:
+            for job_id in queue.unmerged():
+                counts = queue.merge(job_id, output_dir)
+                print(f"✓ Merged {job_id}: {counts['written']} written, {counts['unchanged']} unchanged, "
+                      f"{counts['removed']} removed")
+            status = queue.status()
+            if status != last_status:
+                print(f"Jobs: {status['done']} done, {status['failed']} failed, "
+                      f"{status['leased']} running, {status['pending']} pending")
+                last_status = status
+            if queue.finished() and not queue.unmerged():
+                break
+            if processes and all(process.poll() is not None for process in processes) and not queue.finished():
+                raise Exception("All local workers exited before the queue was finished")
+            time.sleep(poll_seconds)
+    finally:
+        for process in processes:
+            process.wait()
+
+    failures = queue.failures()
+    for job_id, job in failures.items():
+        last_error = job['errors'][-1]['error'] if job.get('errors') else 'unknown error'
+        print(f"❌ {job_id} failed after {job.get('attempts', 0)} attempt(s): {last_error}")
+    if failures:
+        raise Exception(f"{len(failures)} of {len(instruction_files)} jobs failed")
 
 def main():
     parser = argparse.ArgumentParser(description="Generate tests using LLM")
     parser.add_argument(
         "--instructions",
         type=str,
-        required=True,
-        help="Path to test instructions file (YAML format)"
+        help="Path to test instructions file (YAML format), or a directory/glob with --batch"
+    )
+    parser.add_argument(
+        "--test-data",
+        type=str,
+        help="Path to test data JSON used to resolve {{dotted.path}} placeholders"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Treat --instructions as a directory or glob of YAML/CSV instruction files"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of instruction files processed concurrently in batch mode"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk completion cache and always call the LLM"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the LLM response and write each file as soon as it is complete"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Regenerate every scenario instead of only those whose inputs changed"
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        help="Append per-stage timing and token spans to this JSON lines file"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Only validate the instructions against the schema (no LLM client is created)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the prompts that would be sent to the LLM without calling it"
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Show completion cache size and age, then exit"
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Remove every cached completion, then exit"
+    )
+    parser.add_argument(
+        "--ingest-traces",
+        type=str,
+        help="Playwright trace zip, directory or glob to derive api_* columns from (no LLM client is created)"
+    )
+    parser.add_argument(
+        "--trace-csv",
+        type=str,
+        default="trace_interceptions.csv",
+        help="CSV instruction sheet written by --ingest-traces"
+    )
+    parser.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Queue every file matched by --instructions in --queue, start --workers local workers "
+             "(0 for none) and merge their results into --output"
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Process jobs from --queue until it is finished"
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        help="Shared job queue directory for --coordinator/--worker (default: queue.dir in config.yaml)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        help="Worker shard as i/n; jobs of this shard are claimed before the others"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run the long-running generator service (see the service section of config.yaml)"
     )
     parser.add_argument(
         "--output",
@@ -73,19 +639,84 @@ def main():
     )
     
     args = parser.parse_args()
+    cache_command = args.cache_stats or args.clear_cache
+    if args.serve:
+        from service import run_service
+        run_service(Path(args.config), use_cache=not args.no_cache, metrics_path=args.metrics)
+        return
+    if not args.instructions and not (cache_command or args.ingest_traces or args.worker):
+        parser.error("--instructions is required")
     
+    generator = None
+    report = False
     try:
-        generator = TestGenerator(Path(args.config))
-        generator.generate_tests(
-            Path(args.instructions),
-            Path(args.output)
+        generator = TestGenerator(
+            Path(args.config),
+            use_cache=not args.no_cache,
+            stream=args.stream,
+            full=args.full
         )
+        test_data_path = Path(args.test_data) if args.test_data else None
+        if args.ingest_traces:
+            run_trace_ingest(args.ingest_traces, Path(args.trace_csv), generator.config, args.workers)
+            return
+        if cache_command:
+            run_cache_command(generator.completion_cache(), args.clear_cache)
+            return
+        if args.coordinator or args.worker:
+            queue_config = generator.config.get("queue") or {}
+            queue = JobQueue.from_config(args.queue or queue_config.get("dir", ".cache/queue"), queue_config)
+            poll_seconds = float(queue_config.get("poll_seconds", 2))
+            if args.coordinator:
+                run_coordinator(queue, Path(args.config), args.instructions, Path(args.output),
+                                test_data_path, args.workers, poll_seconds)
+                print("\n✓ Distributed generation completed successfully")
+                return
+            report = True
+            worker = default_worker_id()
+            completed = run_worker(generator, queue, worker, parse_shard(args.shard),
+                                   float(queue_config.get("heartbeat_seconds", 30)), poll_seconds)
+            print(f"\n✓ Worker {worker} completed {completed} job(s)")
+            return
+        if args.validate or args.dry_run:
+            instruction_files = find_instruction_files(args.instructions) if args.batch else [Path(args.instructions)]
+            if args.validate:
+                run_validate(generator, instruction_files)
+            else:
+                for path in instruction_files:
+                    for index, prompt in enumerate(generator.render_prompts(path, test_data_path), 1):
+                        print(f"===== {path} (prompt {index}) =====")
+                        print(prompt)
+            return
+        report = True
+        if args.batch:
+            results = generator.generate_batch(
+                args.instructions,
+                Path(args.output),
+                max_workers=args.workers,
+                test_data_path=test_data_path
+            )
+            failed = [path for path, error in results.items() if error]
+            if failed:
+                raise Exception(f"{len(failed)} of {len(results)} instruction files failed")
+        else:
+            generator.generate_tests(
+                Path(args.instructions),
+                Path(args.output),
+                test_data_path
+            )
         print("\n✓ Test generation completed successfully")
         
     except Exception as e:
         print(f"\n❌ Error during test generation: {str(e)}")
         raise
 
+    finally:
+        if generator and report:
+            print("\n" + generator.telemetry.summary_table())
+            if args.metrics:
+                generator.telemetry.export_jsonl(args.metrics)
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,359 @@
+"""Long-running generator service
+
+Keeps one TestGenerator (LLM handler, provider client, HTTP pools, completion
+cache, parsed instruction models) and optionally a RepoContext warm in memory,
+and accepts generation jobs over a local HTTP API:
+
+    POST /jobs                 queue a job, 429 with Retry-After when the queue is full
+    GET  /jobs/<id>            job status and produced files
+    GET  /jobs/<id>/stream     NDJSON stream of files as they are produced
+    POST /validate             validate instructions without queueing
+    GET  /examples?q=...       search the warm repository index
+    GET  /health               queue depth and cache statistics
+"""
+import itertools
+import json
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from main import TestGenerator
+
+INSTRUCTION_FORMATS = ('csv', 'yaml', 'yml')
+# Jobs are serialized per output directory through a fixed set of lock stripes, so the
+# locks do not grow with the number of distinct directories a long-running service sees
+OUTPUT_LOCK_STRIPES = 64
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+class Job:
+    """A queued generation request and the files it has produced so far"""
+
+    def __init__(self, instructions_file: Path, output_dir: Path, test_data_path: Optional[Path] = None,
+                 upload_dir: Optional[Path] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.instructions_file = instructions_file
+        self.output_dir = output_dir
+        self.test_data_path = test_data_path
+        # Directory holding posted instructions, removed once the job has run
+        self.upload_dir = upload_dir
+        self.status = 'queued'
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.files: Dict[str, str] = {}
+        self._events: List[Dict[str, Any]] = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def _publish(self, event: Dict[str, Any]):
+        with self._changed:
+            self._events.append(event)
+            self._changed.notify_all()
+
+    def add_file(self, path: Path, content: str):
+        self.files[path.name] = content
+        self._publish({'event': 'file', 'filename': path.name, 'path': str(path), 'content': content})
+
+    def _release_payloads(self):
+        # Retained jobs keep each file once; replays read content back from self.files
+        with self._changed:
+            self._events = [{key: value for key, value in event.items() if key != 'content'}
+                            for event in self._events]
+
+    def start(self):
+        self.status = 'running'
+        self.started = time.time()
+        self._publish({'event': 'started'})
+
+    def finish(self, error: Optional[Exception] = None):
+        self.finished = time.time()
+        self.status = 'failed' if error else 'done'
+        self.error = str(error) if error else None
+        event = {'event': self.status, 'files': len(self.files)}
+        if error:
+            event['error'] = self.error
+        self._publish(event)
+        self._release_payloads()
+
+    def events(self, timeout: float = 15.0) -> Iterator[Dict[str, Any]]:
+        """Yield events from the beginning, blocking for new ones until the job finishes
+
+        A heartbeat is yielded every `timeout` seconds without events so idle
+        connections are kept open.
+        """
+        for index in itertools.count():
+            with self._changed:
+                while index >= len(self._events) and not self.done:
+                    if not self._changed.wait(timeout):
+                        break
+                if index < len(self._events):
+                    event = self._events[index]
+                    if event['event'] == 'file' and 'content' not in event:
+                        event = {**event, 'content': self.files.get(event['filename'], '')}
+                elif self.done:
+                    return
+                else:
+                    event = None
+            if event is None:
+                yield {'event': 'heartbeat'}
+                continue
+            yield event
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'instructions': str(self.instructions_file),
+            'output_dir': str(self.output_dir),
+            'files': sorted(self.files),
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+class GeneratorService:
+    """Runs generation jobs on a bounded queue against one warm TestGenerator"""
+
+    def __init__(self, config_path: Path, use_cache: bool = True):
+        self.generator = TestGenerator(config_path, use_cache=use_cache)
+        service_config = self.generator.config.get('service') or {}
+        self.output_root = Path(service_config.get('output_dir', 'generated_tests'))
+        self.work_dir = Path(service_config.get('work_dir', '.cache/service'))
+        self.workers = max(1, int(service_config.get('workers', 2)))
+        self.max_jobs_retained = int(service_config.get('max_jobs_retained', 1000))
+        self.repo_path = service_config.get('repo_path')
+        self.metrics_path = service_config.get('metrics')
+        self.queue: "queue.Queue[Job]" = queue.Queue(maxsize=max(1, int(service_config.get('queue_size', 32))))
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._output_locks: List[threading.Lock] = [threading.Lock() for _ in range(OUTPUT_LOCK_STRIPES)]
+        self._repo_context = None
+        self._threads: List[threading.Thread] = []
+
+    def warm_up(self):
+        """Build everything a first request would otherwise pay for"""
+        self.generator._load_base_prompt()
+        self.generator.llm_handler
+        self.generator.step_matcher
+        if self.repo_path:
+            self.repo_context
+
+    @property
+    def repo_context(self):
+        """RepoContext for repo_path, built once and kept in memory"""
+        if self._repo_context is None and self.repo_path:
+            from utils.repo_loader import RepoContext
+            self._repo_context = RepoContext(self.repo_path)
+        return self._repo_context
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"generator-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, instructions_file: Path, output_dir: Optional[Path] = None,
+               test_data_path: Optional[Path] = None, upload_dir: Optional[Path] = None) -> Job:
+        """Queue a job; raises QueueFullError instead of blocking when at capacity"""
+        job = Job(instructions_file, output_dir or self.output_root / instructions_file.stem, test_data_path, upload_dir)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFullError(f"Job queue is full ({self.queue.maxsize} jobs)")
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+            self._prune_jobs()
+        return job
+
+    def submit_content(self, content: str, name: str, fmt: str, **kwargs) -> Job:
+        """Queue a job for instructions posted inline, stored under the service work dir"""
+        if fmt not in INSTRUCTION_FORMATS:
+            raise ValueError(f"Unsupported instruction format: {fmt}")
+        directory = self.work_dir / 'instructions' / uuid.uuid4().hex[:12]
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{Path(name).stem}.{fmt}"
+        path.write_text(content, encoding='utf-8')
+        try:
+            return self.submit(path, upload_dir=directory, **kwargs)
+        except QueueFullError:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def _prune_jobs(self):
+        while len(self.jobs) > self.max_jobs_retained:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.done:
+                break
+            del self.jobs[oldest_id]
+
+    def _output_lock(self, output_dir: Path) -> threading.Lock:
+        # Jobs sharing an output directory share its build manifest, so they run one at a time
+        return self._output_locks[hash(output_dir.resolve()) % OUTPUT_LOCK_STRIPES]
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                with self._output_lock(job.output_dir):
+                    job.start()
+                    self.generator.generate_tests(
+                        job.instructions_file,
+                        job.output_dir,
+                        job.test_data_path,
+                        on_file=job.add_file
+                    )
+                job.finish()
+            except Exception as e:
+                print(f"❌ Job {job.id} failed: {str(e)}")
+                job.finish(e)
+            finally:
+                if job.upload_dir:
+                    shutil.rmtree(job.upload_dir, ignore_errors=True)
+                self._flush_telemetry()
+                self.queue.task_done()
+
+    def _flush_telemetry(self):
+        """Hand finished spans to the metrics file (if configured) instead of keeping them in memory"""
+        telemetry = self.generator.telemetry
+        records = telemetry.drain()
+        if records and self.metrics_path:
+            telemetry.export_jsonl(self.metrics_path, records)
+
+    def health(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            running = sum(1 for job in self.jobs.values() if job.status == 'running')
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'queued': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'running': running,
+            'provider': self.generator.llm_handler.provider_name,
+            'cache': self.generator.completion_cache().stats(),
+            'repo_context': bool(self._repo_context),
+        }
+
+def create_app(service: GeneratorService):
+    """Flask app exposing the service's HTTP API"""
+    from flask import Flask, Response, jsonify, request, stream_with_context
+
+    app = Flask(__name__)
+
+    def error(message: str, status: int, **headers):
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers.update(headers)
+        return response
+
+    def optional_path(value: Optional[str]) -> Optional[Path]:
+        return Path(value) if value else None
+
+    @app.post('/jobs')
+    def submit_job():
+        body = request.get_json(silent=True) or {}
+        options = {
+            'output_dir': optional_path(body.get('output_dir')),
+            'test_data_path': optional_path(body.get('test_data')),
+        }
+        try:
+            if body.get('content') is not None:
+                job = service.submit_content(
+                    body['content'],
+                    body.get('name', 'instructions'),
+                    body.get('format', 'csv').lower(),
+                    **options
+                )
+            elif body.get('instructions'):
+                path = Path(body['instructions'])
+                if not path.is_file():
+                    return error(f"Instructions file not found: {path}", 404)
+                job = service.submit(path, **options)
+            else:
+                return error("Provide 'instructions' (a path) or 'content'", 400)
+        except QueueFullError as e:
+            return error(str(e), 429, **{'Retry-After': '5'})
+        except ValueError as e:
+            return error(str(e), 400)
+        response = jsonify(job.to_dict())
+        response.status_code = 202
+        response.headers['Location'] = f"/jobs/{job.id}"
+        return response
+
+    @app.get('/jobs/<job_id>')
+    def job_status(job_id: str):
+        job = service.get(job_id)
+        if job is None:
+            return error(f"Unknown job: {job_id}", 404)
+        return jsonify(job.to_dict())
+
+    @app.get('/jobs/<job_id>/stream')
+    def job_stream(job_id: str):
+        job = service.get(job_id)
+        if job is None:
+            return error(f"Unknown job: {job_id}", 404)
+
+        def generate():
+            for event in job.events():
+                yield json.dumps(event) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @app.post('/validate')
+    def validate():
+        body = request.get_json(silent=True) or {}
+        if not body.get('instructions'):
+            return error("Provide 'instructions' (a path)", 400)
+        path = Path(body['instructions'])
+        result = service.generator.validate([path])[path]
+        return jsonify({'instructions': str(path), 'valid': result is None, 'error': str(result) if result else None})
+
+    @app.get('/examples')
+    def examples():
+        if service.repo_context is None:
+            return error("No repo_path configured for this service", 404)
+        query = request.args.get('q', '')
+        if not query:
+            return error("Provide a query with ?q=", 400)
+        return jsonify(service.repo_context.find_similar_examples(
+            query,
+            pattern_type=request.args.get('type'),
+            top_k=int(request.args.get('top_k', 10))
+        ))
+
+    @app.get('/health')
+    def health():
+        return jsonify(service.health())
+
+    return app
+
+def run_service(config_path: Path, host: Optional[str] = None, port: Optional[int] = None, use_cache: bool = True,
+                metrics_path: Optional[str] = None):
+    """Start workers, warm caches and serve until interrupted"""
+    service = GeneratorService(config_path, use_cache=use_cache)
+    if metrics_path:
+        service.metrics_path = metrics_path
+    service_config = service.generator.config.get('service') or {}
+    print("Warming up generator...")
+    service.warm_up()
+    service.start()
+    app = create_app(service)
+    host = host or service_config.get('host', '127.0.0.1')
+    port = port or int(service_config.get('port', 8765))
+    print(f"✓ Generator service listening on http://{host}:{port} ({service.workers} workers)")
+    app.run(host=host, port=port, threaded=True)
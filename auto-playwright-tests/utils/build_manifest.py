@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 1
+
+def fingerprint(*parts: Any) -> str:
+    """SHA-256 of JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def scenario_keys(processor, scenarios: List[List[Dict[str, Any]]]) -> List[str]:
+    """
+    Hash each scenario's fully formatted instructions
+
+    Steps are formatted without block references, so a scenario's key covers its
+    own rows and resolved test data and does not change when other scenarios do.
+    """
+    return [
+        fingerprint([processor.format_step(step) for step in scenario])
+        for scenario in scenarios
+    ]
+
+class BuildManifest:
+    """Record of the inputs behind the files generated into an output directory
+
+    For every instruction file the manifest stores a settings fingerprint (base
+    prompt, provider, model settings, shared instructions) and the generated
+    file fragments of each group of scenarios sent to the LLM together, keyed by
+    the hashes of those scenarios. A later run reuses every group whose
+    scenarios are all still present and unchanged and regenerates the rest.
+    """
+
+    def __init__(self, output_dir: str | Path):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def plan(self, source: str, settings: str, keys: List[str]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Split scenarios into reusable groups and scenarios that must be generated
+
+        Args:
+            source: Instruction file name the entry is recorded under
+            settings: Fingerprint of everything shared by all scenarios
+            keys: Scenario hashes in instruction order
+
+        Returns:
+            (reused groups with their current scenario indices, pending scenario indices)
+        """
+        entry = self.entries.get(source)
+        if not entry or entry.get("settings") != settings:
+            return [], list(range(len(keys)))
+
+        available: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            available.setdefault(key, []).append(index)
+
+        reused = []
+        for group in entry.get("groups", []):
+            remaining = {key: list(available.get(key, [])) for key in group["scenarios"]}
+            try:
+                indices = [remaining[key].pop(0) for key in group["scenarios"]]
+            except IndexError:
+                continue
+            # The group that opened each file must still come first, and vice versa
+            if group.get("lead", False) != (0 in indices):
+                continue
+            available.update(remaining)
+            reused.append({**group, "indices": indices})
+
+        claimed = {index for group in reused for index in group["indices"]}
+        pending = [index for index in range(len(keys)) if index not in claimed]
+        return reused, pending
+
+    def changed(self, source: str, settings: str, keys: List[str]) -> List[int]:
+        """Indices of scenarios the last run did not generate under the same settings"""
+        entry = self.entries.get(source)
+        if not entry or entry.get("settings") != settings:
+            return list(range(len(keys)))
+        known = {key for group in entry.get("groups", []) for key in group["scenarios"]}
+        return [index for index, key in enumerate(keys) if key not in known]
+
+    def stale_outputs(self, source: str, outputs: Dict[str, str]) -> List[Path]:
+        """Files generated for source by the last run that this run no longer produces
+
+        Files edited by hand since they were generated are left out.
+        """
+        previous = (self.entries.get(source) or {}).get("outputs", {})
+        stale = []
+        for filename, digest in previous.items():
+            path = self.path.parent / filename
+            if filename in outputs or not path.exists():
+                continue
+            if hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+                stale.append(path)
+        return stale
+
+    def record(self, source: str, settings: str, groups: List[Dict[str, Any]], outputs: Dict[str, str]):
+        """Replace the entry for an instruction file with this run's groups and output hashes"""
+        with self._lock:
+            self.entries[source] = {
+                "settings": settings,
+                "groups": [
+                    {"scenarios": group["scenarios"], "lead": group["lead"], "files": group["files"]}
+                    for group in groups
+                ],
+                "outputs": {
+                    filename: hashlib.sha256(content.encode("utf-8")).hexdigest()
+                    for filename, content in outputs.items()
+                },
+            }
+
+    def save(self):
+        """Write the manifest atomically"""
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "entries": self.entries}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+            os.replace(tmp_path, self.path)
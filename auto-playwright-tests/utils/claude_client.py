@@ -1,37 +1,85 @@
 import os
 import json
-import requests
-from typing import Dict, List, Optional, Union
-from .llm import LLMProvider
+from typing import Any, Dict, Iterator, Optional, Union
+from .llm import LLMProvider, SYSTEM_MESSAGE, split_prefix
+from .http_pool import get_session
+from .telemetry import report_usage
 
 class ClaudeProvider(LLMProvider):
     def __init__(self, config: Dict[str, any]):
         """Initialize Claude provider with configuration"""
         self.api_key = config["api_key"]
-        self.base_url = "https://api.anthropic.com/v1/messages"
+        self.base_url = config.get("base_url", "https://api.anthropic.com/v1/messages")
         self.model = config.get("model", "claude-3-sonnet-20240229")
         self.max_tokens = config.get("max_tokens", 4096)
         self.temperature = config.get("temperature", 0.2)
+        self.max_concurrency = config.get("max_concurrency", 4)
         self.headers = {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json"
         }
 
+    @property
+    def session(self):
+        """Pooled HTTP session, created on first request"""
+        return get_session(self.base_url, pool_size=self.max_concurrency)
+
+    def sampling_params(self, **kwargs) -> Dict[str, any]:
+        """Effective model and sampling parameters for a call"""
+        return {
+            "model": kwargs.get("model", self.model),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens)
+        }
+
+    def _request_body(self, prompt: str, kwargs: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
+        """
+        Messages API request body
+
+        The system message goes in the top-level system field. When the prompt
+        starts with the shared prefix (the base prompt), the prefix is sent as
+        its own content block marked with cache_control, so the system message
+        and prefix are cached once and read from cache by later requests.
+        """
+        prefix, rest = split_prefix(prompt, kwargs.get("prefix"))
+        if prefix:
+            content = [
+                {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": rest or "\n"}
+            ]
+        else:
+            content = prompt
+        data = {
+            "model": kwargs.get("model", self.model),
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "system": [{"type": "text", "text": SYSTEM_MESSAGE}],
+            "messages": [{"role": "user", "content": content}]
+        }
+        if stream:
+            data["stream"] = True
+        return data
+
+    @staticmethod
+    def _report_usage(usage: Dict[str, Any], completion: bool = True):
+        """Report usage; input_tokens excludes tokens written to or read from the prompt cache"""
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        cache_write = usage.get("cache_creation_input_tokens") or 0
+        input_tokens = usage.get("input_tokens")
+        report_usage(
+            input_tokens + cache_read + cache_write if input_tokens is not None else None,
+            usage.get("output_tokens") if completion else None,
+            cache_read if "cache_read_input_tokens" in usage else None
+        )
+
     def generate_completion(self, prompt: str, **kwargs) -> str:
         """Generate completion using Claude API"""
+        import requests
         try:
-            data = {
-                "model": kwargs.get("model", self.model),
-                "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-                "temperature": kwargs.get("temperature", self.temperature),
-                "messages": [
-                    {"role": "system", "content": "You are a test automation expert specializing in Playwright with TypeScript and Cucumber."},
-                    {"role": "user", "content": prompt}
-                ]
-            }
+            data = self._request_body(prompt, kwargs)
             
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
                 headers=self.headers,
                 json=data,
@@ -39,17 +87,52 @@ class ClaudeProvider(LLMProvider):
             )
             response.raise_for_status()
             
-            return response.json()["content"][0]["text"]
+            body = response.json()
+            self._report_usage(body.get("usage", {}))
+            return body["content"][0]["text"]
             
-        except requests.exceptions.Timeout:
-            raise Exception("Claude API request timed out")
+        except requests.exceptions.Timeout as e:
+            raise Exception("Claude API request timed out") from e
         except requests.exceptions.RequestException as e:
-            raise Exception(f"Claude API request failed: {str(e)}")
+            raise Exception(f"Claude API request failed: {str(e)}") from e
         except KeyError as e:
-            raise Exception(f"Unexpected Claude API response format: {str(e)}")
+            raise Exception(f"Unexpected Claude API response format: {str(e)}") from e
         except Exception as e:
-            raise Exception(f"Error calling Claude API: {str(e)}")
+            raise Exception(f"Error calling Claude API: {str(e)}") from e
 
-    def generate_completions(self, prompts: List[str], **kwargs) -> List[str]:
-        """Generate multiple completions"""
-        return [self.generate_completion(prompt, **kwargs) for prompt in prompts] 
\ No newline at end of file
+    def stream_completion(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Stream completion text from the Claude API via server-sent events"""
+        import requests
+        try:
+            data = self._request_body(prompt, kwargs, stream=True)
+
+            with self.session.post(
+                self.base_url,
+                headers=self.headers,
+                json=data,
+                timeout=kwargs.get("timeout", 60),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:].strip())
+                    if event.get("type") == "message_start":
+                        # Input and cache usage arrive up front; output tokens in message_delta
+                        self._report_usage(event.get("message", {}).get("usage", {}), completion=False)
+                    elif event.get("type") == "message_delta":
+                        report_usage(completion_tokens=event.get("usage", {}).get("output_tokens"))
+                    elif event.get("type") == "content_block_delta":
+                        text = event.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif event.get("type") == "error":
+                        raise Exception(event.get("error", {}).get("message", "stream error"))
+
+        except requests.exceptions.Timeout as e:
+            raise Exception("Claude API request timed out") from e
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Claude API request failed: {str(e)}") from e
+        except Exception as e:
+            raise Exception(f"Error calling Claude API: {str(e)}") from e
\ No newline at end of file
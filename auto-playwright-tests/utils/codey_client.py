@@ -1,11 +1,13 @@
-from typing import List, Optional, Dict, Any
-from langchain_google_vertexai import VertexAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from .llm import LLMProvider
+import threading
+from typing import Iterator, List, Optional, Dict, Any
+from .llm import LLMProvider, SYSTEM_MESSAGE
+
+SYSTEM_TEMPLATE = SYSTEM_MESSAGE + """
+
+{user_input}"""
 
 class CodeyProvider(LLMProvider):
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], llm: Optional[Any] = None):
         """
         Initialize Codey provider with configuration
         
@@ -15,42 +17,90 @@ class CodeyProvider(LLMProvider):
                 - location: GCP region (default: us-central1)
                 - max_output_tokens: Maximum tokens in response (default: 1024)
                 - temperature: Temperature for generation (default: 0.2)
+                - max_concurrency: Concurrent requests for batched calls (default: 4)
+            llm: Optional pre-built LLM (any LangChain runnable or callable), e.g. a stub in tests
         """
-        self.project_id = config["project_id"]
+        self.project_id = config.get("project_id")
         self.location = config.get("location", "us-central1")
         self.max_output_tokens = config.get("max_output_tokens", 1024)
         self.temperature = config.get("temperature", 0.2)
-        
-        self.llm = VertexAI(
-            model_name="code-bison",
-            project=self.project_id,
-            location=self.location,
-            max_output_tokens=self.max_output_tokens,
-            temperature=self.temperature
-        )
+        self.max_concurrency = config.get("max_concurrency", 4)
+        self._llm = llm
+        self._chain = None
+        self._lock = threading.Lock()
+
+    @property
+    def llm(self):
+        """Vertex AI client; LangChain is imported on first use so startup stays cheap"""
+        with self._lock:
+            if self._llm is None:
+                if not self.project_id:
+                    raise ValueError("Codey provider requires project_id in its config")
+                from langchain_google_vertexai import VertexAI
+                self._llm = VertexAI(
+                    model_name="code-bison",
+                    project=self.project_id,
+                    location=self.location,
+                    max_output_tokens=self.max_output_tokens,
+                    temperature=self.temperature
+                )
+            return self._llm
+
+    @property
+    def chain(self):
+        """Prompt template piped into the LLM, built once per provider instance"""
+        llm = self.llm
+        with self._lock:
+            if self._chain is None:
+                from langchain_core.prompts import PromptTemplate
+                self._chain = PromptTemplate.from_template(SYSTEM_TEMPLATE) | llm
+            return self._chain
+
+    def sampling_params(self, **kwargs) -> Dict[str, Any]:
+        """Effective model and sampling parameters for a call"""
+        return {
+            "model": "code-bison",
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_output_tokens
+        }
+
+    def _batch_config(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"max_concurrency": kwargs.get("max_concurrency", self.max_concurrency)}
 
     def generate_completion(self, prompt: str, **kwargs) -> str:
         """Generate completion using Codey"""
         try:
-            # Create prompt template with system prompt
-            template = """You are a test automation expert specializing in Playwright with TypeScript and Cucumber.
+            return self.chain.invoke({"user_input": prompt})
+        except Exception as e:
+            raise Exception(f"Error calling Codey API: {str(e)}") from e
 
-{user_input}"""
-            
-            prompt_template = PromptTemplate(
-                template=template,
-                input_variables=["user_input"]
-            )
-            
-            # Create chain
-            chain = LLMChain(llm=self.llm, prompt=prompt_template)
-            
-            # Get prediction
-            return chain.predict(user_input=prompt)
-            
+    def stream_completion(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Stream completion text from Codey as it is generated"""
+        try:
+            yield from self.chain.stream({"user_input": prompt})
         except Exception as e:
-            raise Exception(f"Error calling Codey API: {str(e)}")
+            raise Exception(f"Error calling Codey API: {str(e)}") from e
 
     def generate_completions(self, prompts: List[str], **kwargs) -> List[str]:
-        """Generate multiple completions"""
-        return [self.generate_completion(prompt, **kwargs) for prompt in prompts] 
\ No newline at end of file
+        """Generate multiple completions in one batch, at most max_concurrency in flight"""
+        return_exceptions = kwargs.pop("return_exceptions", False)
+        try:
+            return self.chain.batch(
+                [{"user_input": prompt} for prompt in prompts],
+                config=self._batch_config(kwargs),
+                return_exceptions=return_exceptions
+            )
+        except Exception as e:
+            raise Exception(f"Error calling Codey API: {str(e)}") from e
+
+    async def agenerate_completions(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate multiple completions on the event loop, at most max_concurrency in flight"""
+        return_exceptions = kwargs.pop("return_exceptions", False)
+        try:
+            return await self.chain.abatch(
+                [{"user_input": prompt} for prompt in prompts],
+                config=self._batch_config(kwargs),
+                return_exceptions=return_exceptions
+            )
+        except Exception as e:
+            raise Exception(f"Error calling Codey API: {str(e)}") from e
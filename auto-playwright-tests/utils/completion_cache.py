@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+# Writes between full scans of the cache directory; in between, a running
+# total of entries and bytes decides whether eviction is needed
+EVICT_INTERVAL = 100
+# Eviction frees down to this fraction of the limits, so a full cache is not rescanned on every write
+EVICT_TARGET = 0.9
+
+class CompletionCache:
+    """Content-addressed on-disk cache for LLM completions
+
+    Entries are keyed by a SHA-256 of the provider name, sampling parameters and
+    the final prompt, and stored as one JSON file per entry. Entries older than
+    max_age_seconds are treated as misses; once the cache grows past max_entries
+    or max_bytes the least recently used entries are evicted. Long-running
+    processes can keep the memory_entries most recent completions in memory.
+    """
+
+    def __init__(self, cache_dir: str | Path = ".cache/completions",
+                 max_age_seconds: Optional[float] = 7 * 24 * 3600,
+                 max_entries: Optional[int] = 5000,
+                 max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 memory_entries: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Running totals since the last scan; None until the directory has been scanned
+        self._entry_count: Optional[int] = None
+        self._total_bytes = 0
+        self._writes = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CompletionCache":
+        """Build a cache from the `cache` section of the generator config"""
+        max_age_days = config.get("max_age_days", 7)
+        max_size_mb = config.get("max_size_mb", 256)
+        return cls(
+            cache_dir=config.get("dir", ".cache/completions"),
+            max_age_seconds=max_age_days * 24 * 3600 if max_age_days else None,
+            max_entries=config.get("max_entries", 5000),
+            max_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+            memory_entries=config.get("memory_entries", 0)
+        )
+
+    @staticmethod
+    def make_key(provider: str, params: Dict[str, Any], prompt: str) -> str:
+        """Hash provider, sampling parameters and prompt into a cache key"""
+        payload = json.dumps(
+            {"provider": provider, "params": params, "prompt": prompt},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None on a miss or expired entry"""
+        if self.memory_entries:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    created, completion = entry
+                    if self.max_age_seconds is None or time.time() - created <= self.max_age_seconds:
+                        self._memory.move_to_end(key)
+                        return completion
+                    del self._memory[key]
+
+        path = self._entry_path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        if self.max_age_seconds is not None and time.time() - stat.st_mtime > self.max_age_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            path.unlink(missing_ok=True)
+            return None
+
+        # Bump access time so eviction keeps recently used entries
+        os.utime(path, (time.time(), stat.st_mtime))
+        completion = entry.get("completion")
+        if completion is not None:
+            self._remember(key, entry.get("created", stat.st_mtime), completion)
+        return completion
+
+    def _remember(self, key: str, created: float, completion: str):
+        if not self.memory_entries:
+            return
+        with self._lock:
+            self._memory[key] = (created, completion)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def set(self, key: str, completion: str, metadata: Optional[Dict[str, Any]] = None):
+        """Store a completion atomically and evict old entries if over budget"""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"completion": completion, "metadata": metadata or {}, "created": time.time()}
+        data = json.dumps(entry).encode("utf-8")
+        try:
+            previous = path.stat().st_size
+        except FileNotFoundError:
+            previous = None
+
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self._remember(key, entry["created"], completion)
+
+        with self._lock:
+            if self._entry_count is not None:
+                self._entry_count += previous is None
+                self._total_bytes += len(data) - (previous or 0)
+                self._writes += 1
+            due = self._entry_count is None or self._writes >= EVICT_INTERVAL or self._over_limits()
+        if due:
+            self.evict()
+
+    def _over_limits(self) -> bool:
+        return (
+            (self.max_entries is not None and self._entry_count > self.max_entries)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        )
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until within limits
+
+        Scans the whole cache directory; set() only calls it every EVICT_INTERVAL
+        writes or when its running totals cross a limit.
+        """
+        if not self.cache_dir.exists():
+            return
+
+        with self._lock:
+            now = time.time()
+            entries = []
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if self.max_age_seconds is not None and now - stat.st_mtime > self.max_age_seconds:
+                    path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            over = (
+                (self.max_entries is not None and len(entries) > self.max_entries)
+                or (self.max_bytes is not None and total_bytes > self.max_bytes)
+            )
+            max_entries = int(self.max_entries * EVICT_TARGET) if over and self.max_entries is not None else self.max_entries
+            max_bytes = int(self.max_bytes * EVICT_TARGET) if over and self.max_bytes is not None else self.max_bytes
+            while entries and (
+                (max_entries is not None and len(entries) > max_entries)
+                or (max_bytes is not None and total_bytes > max_bytes)
+            ):
+                _, size, path = entries.pop(0)
+                path.unlink(missing_ok=True)
+                total_bytes -= size
+            self._entry_count, self._total_bytes, self._writes = len(entries), total_bytes, 0
+
+    def clear(self):
+        """Remove every cached completion"""
+        with self._lock:
+            self._memory.clear()
+            self._entry_count = None
+        for path in self.cache_dir.glob("*/*.json"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, total size and age range of the cache, read from file metadata only"""
+        now = time.time()
+        entries, total_bytes, expired = 0, 0, 0
+        oldest = newest = None
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries += 1
+            total_bytes += stat.st_size
+            if self.max_age_seconds is not None and now - stat.st_mtime > self.max_age_seconds:
+                expired += 1
+            oldest = stat.st_mtime if oldest is None else min(oldest, stat.st_mtime)
+            newest = stat.st_mtime if newest is None else max(newest, stat.st_mtime)
+        return {
+            "dir": str(self.cache_dir),
+            "entries": entries,
+            "bytes": total_bytes,
+            "expired": expired,
+            "oldest": oldest,
+            "newest": newest,
+        }
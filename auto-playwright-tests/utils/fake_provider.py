@@ -0,0 +1,125 @@
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator
+from .llm import LLMProvider, split_prefix
+from .telemetry import report_usage
+from .prompt_builder import estimate_tokens
+
+class FakeProviderError(Exception):
+    """Injected provider failure carrying an HTTP-like status for the retry scheduler"""
+
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+class FakeProvider(LLMProvider):
+    """Deterministic offline provider for benchmarks and dry runs
+
+    Responses are canned multi-file answers derived from the prompt hash, so the
+    same prompt always produces the same files, latency and failures.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize fake provider with configuration
+
+        Args:
+            config: Configuration dictionary containing:
+                - model: Model name reported in sampling params (default: fake)
+                - latency_ms: Mean response latency (default: 50)
+                - latency_jitter_ms: Uniform jitter added to the latency (default: 0)
+                - files_per_response: Number of files in each response (default: 3)
+                - lines_per_file: Lines of code in each file (default: 40)
+                - error_rate: Fraction of calls failing with a retryable 503 (default: 0)
+                - throttle_rate: Fraction of calls failing with a 429 (default: 0)
+                - chunk_size: Characters per chunk when streaming (default: 256)
+                - seed: Seed mixed into every per-prompt random stream (default: 0)
+                - prefix_cache: Report a shared prompt prefix as cached after its first use (default: true)
+                - max_concurrency: Concurrent requests for batched calls (default: 4)
+        """
+        self.model = config.get("model", "fake")
+        self.latency_ms = float(config.get("latency_ms", 50))
+        self.latency_jitter_ms = float(config.get("latency_jitter_ms", 0))
+        self.files_per_response = max(1, int(config.get("files_per_response", 3)))
+        self.lines_per_file = max(1, int(config.get("lines_per_file", 40)))
+        self.error_rate = float(config.get("error_rate", 0))
+        self.throttle_rate = float(config.get("throttle_rate", 0))
+        self.chunk_size = max(1, int(config.get("chunk_size", 256)))
+        self.seed = config.get("seed", 0)
+        self.max_concurrency = config.get("max_concurrency", 4)
+        self.prefix_cache = config.get("prefix_cache", True)
+        self._cached_prefixes = set()
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def sampling_params(self, **kwargs) -> Dict[str, Any]:
+        """Effective model and sampling parameters for a call"""
+        return {
+            "model": kwargs.get("model", self.model),
+            "files_per_response": self.files_per_response,
+            "lines_per_file": self.lines_per_file
+        }
+
+    def _random(self, prompt: str) -> random.Random:
+        # Each attempt at the same prompt gets its own stream so retries can succeed
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        digest = hashlib.sha256(f"{self.seed}:{attempt}:{key}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def _cached_tokens(self, prompt: str, prefix: str | None) -> int:
+        """Simulate provider prefix caching: a prefix is a hit once it has been seen"""
+        prefix, _ = split_prefix(prompt, prefix)
+        if not (self.prefix_cache and prefix):
+            return 0
+        with self._lock:
+            hit = prefix in self._cached_prefixes
+            self._cached_prefixes.add(prefix)
+        return estimate_tokens(prefix) if hit else 0
+
+    def _respond(self, prompt: str, prefix: str | None = None) -> str:
+        rng = self._random(prompt)
+        time.sleep(max(0.0, self.latency_ms + rng.uniform(0, self.latency_jitter_ms)) / 1000)
+
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            raise FakeProviderError("Fake provider rate limit exceeded", status_code=429)
+        if roll < self.throttle_rate + self.error_rate:
+            raise FakeProviderError("Fake provider unavailable", status_code=503)
+
+        response = render_response(prompt, self.files_per_response, self.lines_per_file)
+        report_usage(estimate_tokens(prompt), estimate_tokens(response), self._cached_tokens(prompt, prefix))
+        return response
+
+    def generate_completion(self, prompt: str, **kwargs) -> str:
+        """Return a canned multi-file response after the configured latency"""
+        return self._respond(prompt, kwargs.get("prefix"))
+
+    def stream_completion(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the canned response in fixed-size chunks"""
+        response = self._respond(prompt, kwargs.get("prefix"))
+        for start in range(0, len(response), self.chunk_size):
+            yield response[start:start + self.chunk_size]
+
+
+_FILE_KINDS = (
+    ("gherkin", "feature", "    Given step {line} of {name}"),
+    ("typescript", "page.ts", "  readonly element{line} = this.page.locator('[data-testid=\"{name}-{line}\"]');"),
+    ("typescript", "steps.ts", "When('I run step {line} of {name}', async function () {{ await this.page.click('#{name}-{line}'); }});"),
+    ("typescript", "spec.ts", "test('{name} case {line}', async ({{ page }}) => {{ await expect(page).toHaveURL(/{name}/); }});"),
+)
+
+def render_response(prompt: str, files: int, lines: int) -> str:
+    """Render a response in the fenced ```language:filename format the parser expects"""
+    name = "generated" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    blocks = []
+    for index in range(files):
+        language, suffix, template = _FILE_KINDS[index % len(_FILE_KINDS)]
+        filename = f"{name}{index // len(_FILE_KINDS) or ''}.{suffix}"
+        body = "\n".join(template.format(line=line, name=name) for line in range(lines))
+        blocks.append(f"```{language}:{filename}\n{body}\n```")
+    return "Here are the generated files.\n\n" + "\n\n".join(blocks) + "\n"
@@ -0,0 +1,35 @@
+import threading
+from typing import Dict, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+_sessions: Dict[Tuple[str, int], "requests.Session"] = {}
+_lock = threading.Lock()
+
+def get_session(base_url: str, pool_size: int = 10) -> "requests.Session":
+    """Return a shared keep-alive session for a provider endpoint
+
+    Sessions are created once per (base_url, pool_size) and reused by every
+    provider instance, so repeated calls skip the TCP/TLS handshake.
+    """
+    key = (base_url, pool_size)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            # Imported here so commands that never call a provider skip loading requests
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+def close_sessions():
+    """Close every pooled session"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
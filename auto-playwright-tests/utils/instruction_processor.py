@@ -1,24 +1,179 @@
 import yaml
 import csv
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any, Tuple
 import json
+from .instruction_validator import DEFAULT_SCHEMA_PATH, InstructionValidationError, load_validator
+
+_TEMPLATE_VARIABLE = re.compile(r'\{\{\s*([^{}]+?)\s*\}\}')
+_DOTTED_PATH = re.compile(r'[A-Za-z_]\w*(?:\.\w+)*$')
+
+# Roots that refer to runtime objects in the generated test, not to test data
+RUNTIME_ROOTS = ('world',)
+
+# Distinct formatted interceptions/validations kept per processor
+FORMAT_CACHE_SIZE = 1024
+
+# Parsed instruction models kept in memory, keyed by path, mtime and size
+MODEL_CACHE_SIZE = 64
+_model_cache: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+_model_cache_lock = threading.Lock()
+# Parses are serialized per path through a fixed set of lock stripes, so the
+# locks do not grow with the number of distinct files seen by a long-running process
+PARSE_LOCK_STRIPES = 64
+_parse_locks: List[threading.Lock] = [threading.Lock() for _ in range(PARSE_LOCK_STRIPES)]
+
+def load_instruction_model(path: str | Path, parser) -> Dict[str, Any]:
+    """
+    Return the parsed instruction model for path, parsing it at most once per version
+
+    The model is shared between callers and must be treated as read-only.
+
+    Args:
+        path: Instruction file path
+        parser: Callable that parses the file into an instruction model
+    """
+    path = Path(path)
+    resolved = str(path.resolve())
+    parse_lock = _parse_locks[hash(resolved) % PARSE_LOCK_STRIPES]
+
+    # Concurrent callers for the same file wait for a single parse
+    with parse_lock:
+        stat = path.stat()
+        key = (resolved, stat.st_mtime_ns, stat.st_size)
+        with _model_cache_lock:
+            if key in _model_cache:
+                _model_cache.move_to_end(key)
+                return _model_cache[key]
+
+        model = parser()
+
+        with _model_cache_lock:
+            for stale in [k for k in _model_cache if k[0] == resolved]:
+                del _model_cache[stale]
+            _model_cache[key] = model
+            while len(_model_cache) > MODEL_CACHE_SIZE:
+                _model_cache.popitem(last=False)
+        return model
+
+class TemplateVariableError(KeyError):
+    """Raised when a {{dotted.path}} placeholder cannot be resolved from test data"""
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+@lru_cache(maxsize=4096)
+def compile_template(template: str) -> Tuple[str | Tuple[str, ...], ...]:
+    """
+    Parse a template once into literal strings and variable paths
+
+    {{users.valid.email}} becomes ('users', 'valid', 'email'); placeholders that
+    are not plain dotted paths, or that start with a runtime root such as
+    world, are kept as literal text for the generated code to handle.
+    """
+    parts = []
+    literal_start = 0
+    for match in _TEMPLATE_VARIABLE.finditer(template):
+        expression = match.group(1)
+        if not _DOTTED_PATH.match(expression) or expression.split('.')[0] in RUNTIME_ROOTS:
+            continue
+        parts.append(template[literal_start:match.start()])
+        parts.append(tuple(expression.split('.')))
+        literal_start = match.end()
+    parts.append(template[literal_start:])
+    return tuple(part for part in parts if part != "")
+
+def lookup_path(data: Any, path: Tuple[str, ...]) -> Any:
+    """Look up a dotted path in nested dicts/lists, raising TemplateVariableError if missing"""
+    value = data
+    for depth, key in enumerate(path):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            resolved = '.'.join(path[:depth]) or '<test data>'
+            available = ', '.join(sorted(value)) if isinstance(value, dict) else type(value).__name__
+            raise TemplateVariableError(
+                f"Cannot resolve '{{{{{'.'.join(path)}}}}}': '{key}' not found in {resolved} "
+                f"(available: {available})"
+            )
+    return value
+
+def _ends_in_string(text: str, in_string: bool = False) -> bool:
+    """Whether JSON text starting in (or out of) a string literal ends inside one"""
+    escaped = False
+    for char in text:
+        if escaped:
+            escaped = False
+        elif char == '\\' and in_string:
+            escaped = True
+        elif char == '"':
+            in_string = not in_string
+    return in_string
+
+def _json_value(value: Any, in_string: bool) -> str:
+    """Render a test data value for a JSON template, escaped for its position"""
+    if in_string:
+        text = value if isinstance(value, str) else json.dumps(value)
+        return json.dumps(text)[1:-1]
+    return json.dumps(value)
 
 class InstructionProcessor:
-    def __init__(self, instruction_file: str, test_data_path: str | None = None):
+    def __init__(self, instruction_file: str, test_data_path: str | None = None, stream: bool = False,
+                 step_matcher=None):
         """
         Initialize instruction processor
         
         Args:
             instruction_file: Path to instruction file (YAML or CSV)
             test_data_path: Optional path to test data file
+            stream: Stream CSV rows from disk on every pass instead of sharing
+                the cached parsed model (flat memory for very large sheets)
+            step_matcher: Optional StepMatcher; steps it matches are formatted as
+                references to their existing step definitions
         """
         self.instruction_file = Path(instruction_file)
-        self.instructions = self._load_instructions()
+        self.stream = stream
+        self.step_matcher = step_matcher
+        self._instructions = None
         self.test_data = self._load_json(test_data_path) if test_data_path else None
+        self._formatted: Dict[Tuple, str] = {}
+
+    @property
+    def is_csv(self) -> bool:
+        return self.instruction_file.suffix.lower() == '.csv'
+
+    @property
+    def instructions(self) -> Dict[str, Any]:
+        """Fully loaded instruction model (materializes every step)"""
+        if self._instructions is None:
+            self._instructions = self._load_instructions()
+        return self._instructions
+
+    @property
+    def feature_name(self) -> str:
+        if self.is_csv and self._instructions is None:
+            return self.instruction_file.stem
+        return self.instructions['feature_name']
+
+    def iter_steps(self) -> Iterator[Dict[str, Any]]:
+        """Yield step dictionaries; in stream mode CSV rows are read without loading the whole sheet"""
+        if self.stream and self._instructions is None and self.is_csv:
+            yield from self._iter_csv_steps(str(self.instruction_file))
+        else:
+            yield from self.instructions['steps']
 
     def _load_instructions(self) -> Dict[str, Any]:
-        """Load instructions from file (YAML or CSV)"""
+        """Load instructions, sharing one parse per file version across processors"""
+        return load_instruction_model(self.instruction_file, self._parse_instructions)
+
+    def _parse_instructions(self) -> Dict[str, Any]:
+        """Parse instructions from file (YAML or CSV)"""
         if self.instruction_file.suffix.lower() == '.csv':
             return self._load_csv(str(self.instruction_file))
         else:
@@ -26,56 +181,70 @@ class InstructionProcessor:
 
     def _load_csv(self, path: str) -> Dict[str, Any]:
         """Load and process CSV file directly"""
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            
-        instructions = {
+        return {
             "feature_name": Path(path).stem,
-            "steps": []
+            "steps": list(self._iter_csv_steps(path))
         }
+
+    def _iter_csv_steps(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Stream CSV rows as step dictionaries"""
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield self._row_to_step(row)
+
+    def _row_to_step(self, row: Dict[str, str]) -> Dict[str, Any]:
+        """Convert a CSV row into a step dictionary"""
+        step = {
+            "step": row["step_description"],
+            "api_interceptions": [],
+            "validations": [],
+            "test_data": {}
+        }
+        
+        # Process optional API interceptions
+        if row.get("api_endpoint") and row.get("api_method"):
+            # Non-numeric statuses are kept as-is and reported by validate()
+            status = (row.get("api_status") or "200").strip()
+            interception = {
+                "endpoint": row["api_endpoint"],
+                "method": row["api_method"],
+                "status": int(status) if status.isdigit() else status,
+                "response_key": row.get("response_key", ""),
+            }
+            if row.get("response_template"):
+                interception["response_template"] = row["response_template"]
+            step["api_interceptions"].append(interception)
         
-        for row in rows:
-            step = {
-                "step": row["step_description"],
-                "api_interceptions": [],
-                "validations": [],
-                "test_data": {}
+        # Process optional validations
+        if row.get("validation_type") and row.get("validation_value"):
+            validation = {
+                "type": row["validation_type"],
+                "value": row["validation_value"]
             }
-            
-            # Process optional API interceptions
-            if row.get("api_endpoint") and row.get("api_method"):
-                interception = {
-                    "endpoint": row["api_endpoint"],
-                    "method": row["api_method"],
-                    "status": int(row.get("api_status", "200")),
-                    "response_key": row.get("response_key", ""),
-                }
-                if row.get("response_template"):
-                    interception["response_template"] = row["response_template"]
-                step["api_interceptions"].append(interception)
-            
-            # Process optional validations
-            if row.get("validation_type") and row.get("validation_value"):
-                validation = {
-                    "type": row["validation_type"],
-                    "value": row["validation_value"]
-                }
-                if row.get("validation_selector"):
-                    validation["selector"] = row["validation_selector"]
-                if row.get("validation_assertion"):
-                    validation["assertion"] = row["validation_assertion"]
-                step["validations"].append(validation)
-            
-            # Process optional test data
-            if row.get("test_data_source"):
-                step["test_data"]["source"] = row["test_data_source"]
-                if row.get("test_data_field"):
-                    step["test_data"]["field"] = row["test_data_field"]
-            
-            instructions["steps"].append(step)
-            
-        return instructions
+            if row.get("validation_selector"):
+                validation["selector"] = row["validation_selector"]
+            if row.get("validation_assertion"):
+                validation["assertion"] = row["validation_assertion"]
+            step["validations"].append(validation)
+        
+        # Process optional test data
+        if row.get("test_data_source"):
+            step["test_data"]["source"] = row["test_data_source"]
+            if row.get("test_data_field"):
+                step["test_data"]["field"] = row["test_data_field"]
+        
+        return step
+
+    def validate(self, schema_path: str | Path = DEFAULT_SCHEMA_PATH):
+        """Check every step against the instruction schema, reporting all errors at once"""
+        validator = load_validator(schema_path)
+        if self.stream and self.is_csv and self._instructions is None:
+            # Only steps can be wrong in a CSV sheet; check them as they stream
+            errors = validator.validate_steps(self.iter_steps())
+        else:
+            errors = validator.validate(self.instructions)
+        if errors:
+            raise InstructionValidationError(str(self.instruction_file), errors)
 
     def _load_yaml(self, path: str) -> Dict[str, Any]:
         """Load YAML file"""
@@ -87,19 +256,55 @@ class InstructionProcessor:
         with open(path, 'r') as f:
             return json.load(f)
 
-    def _resolve_template_variables(self, template: str) -> str:
-        """Replace {{variable}} placeholders with actual values"""
+    def _resolve_template_variables(self, template: str, as_json: bool = False) -> str:
+        """
+        Replace {{variable}} placeholders with actual values
+
+        With as_json, values are JSON-encoded: escaped in place inside a string
+        literal and written as a JSON value anywhere else.
+        """
         if not self.test_data:
             return template
-            
-        # TODO: Implement variable resolution from test_data and world object references
-        return template
+
+        parts = compile_template(template)
+        if len(parts) == 1 and isinstance(parts[0], str):
+            return parts[0]
+
+        resolved = []
+        in_string = False
+        for part in parts:
+            if isinstance(part, str):
+                resolved.append(part)
+                if as_json:
+                    in_string = _ends_in_string(part, in_string)
+            else:
+                value = lookup_path(self.test_data, part)
+                if as_json:
+                    resolved.append(_json_value(value, in_string))
+                else:
+                    resolved.append(value if isinstance(value, str) else json.dumps(value))
+        return "".join(resolved)
+
+    def _memoized(self, kind: str, spec: Dict[str, Any], formatter) -> str:
+        """Format an interception/validation once per distinct definition"""
+        key = (kind,) + tuple(sorted((k, str(v)) for k, v in spec.items()))
+        formatted = self._formatted.get(key)
+        if formatted is None:
+            if len(self._formatted) >= FORMAT_CACHE_SIZE:
+                # Keep memory flat on sheets with many distinct rows
+                self._formatted.clear()
+            formatted = self._formatted[key] = formatter(spec)
+        return formatted
 
     def _format_api_interception(self, interception: Dict[str, Any]) -> str:
         """Format a single API interception instruction"""
+        return self._memoized('interception', interception, self._render_api_interception)
+
+    def _render_api_interception(self, interception: Dict[str, Any]) -> str:
+        """Render an API interception as a page.route block"""
         response = interception.get('response_template', '{}')
         if isinstance(response, str):
-            response = self._resolve_template_variables(response)
+            response = self._resolve_template_variables(response, as_json=True)
 
         return f"""await page.route('{interception['endpoint']}', async (route) => {{
   const response = {response};
@@ -112,6 +317,10 @@ class InstructionProcessor:
 
     def _format_validation(self, validation: Dict[str, Any]) -> str:
         """Format a single validation instruction"""
+        return self._memoized('validation', validation, self._render_validation)
+
+    def _render_validation(self, validation: Dict[str, Any]) -> str:
+        """Render a validation as an expect statement"""
         if validation['type'] == 'url':
             expected = self._resolve_template_variables(validation['value'])
             return f"expect(page.url()).toContain('{expected}');"
@@ -120,45 +329,132 @@ class InstructionProcessor:
             return f"""await expect(page.locator('{validation['selector']}')).{validation['assertion']}('{value}');"""
         return ""
 
-    def generate_instructions(self) -> str:
-        """Generate formatted instructions from the template"""
-        instructions = [f"# Additional Instructions for: {self.instructions['feature_name']}\n"]
+    def _format_test_data(self, test_data: Dict[str, Any]) -> str:
+        """Describe a step's test data reference, with its value when it resolves in the test data"""
+        path = test_data['source']
+        if test_data.get('field'):
+            path = f"{path}.{test_data['field']}"
+        if not self.test_data or not _DOTTED_PATH.match(path):
+            return f"Use value from: {test_data['source']}"
+        try:
+            value = lookup_path(self.test_data, tuple(path.split('.')))
+        except TemplateVariableError:
+            return f"Use value from: {test_data['source']}"
+        return f"Use value from: {path} = {json.dumps(value)}"
+
+    def format_header(self) -> str:
+        """Format the instructions title line"""
+        return f"# Additional Instructions for: {self.feature_name}\n"
+
+    def format_global_interceptions(self) -> str:
+        """Format global API interceptions, or an empty string if there are none"""
+        # CSV sheets have no global interceptions; avoid materializing them
+        if self.is_csv or not self.instructions.get('global_interceptions'):
+            return ""
+        lines = ["## Global API Interceptions", "```typescript"]
+        for interception in self.instructions['global_interceptions']:
+            lines.append(self._format_api_interception(interception))
+        lines.append("```\n")
+        return "\n".join(lines)
+
+    def format_step(self, step: Dict[str, Any], seen_blocks: Dict[str, str] | None = None) -> str:
+        """
+        Format the instructions for a single step
+
+        Args:
+            step: Step dictionary
+            seen_blocks: Optional map of already emitted code blocks to the step
+                that introduced them; repeats are replaced by a short reference
+        """
+        lines = [f"\n### Step: {step['step']}"]
+
+        # Existing step definitions are reused as-is, so their details are not needed
+        implemented = self.implemented_by(step)
+        if implemented:
+            lines.append(
+                f"Already implemented in src/step-definitions/{implemented}.ts: use this exact step text "
+                f"in the feature file and do not generate a step definition for it."
+            )
+            return "\n".join(lines)
+
+        def add_block(block: str, kind: str):
+            if seen_blocks is None:
+                lines.append(block)
+            elif block in seen_blocks:
+                lines.append(f"// Same {kind} as step: {seen_blocks[block]}")
+            else:
+                seen_blocks[block] = step['step']
+                lines.append(block)
+
+        # Add API interceptions
+        if step.get('api_interceptions'):
+            lines.append("\nAPI Interceptions:")
+            lines.append("```typescript")
+            for interception in step['api_interceptions']:
+                add_block(self._format_api_interception(interception), "API interception")
+            lines.append("```")
+
+        # Add test data
+        if step.get('test_data') and step['test_data'].get('source'):
+            lines.append("\nTest Data:")
+            lines.append(self._format_test_data(step['test_data']))
+
+        # Add validations
+        if step.get('validations'):
+            lines.append("\nValidations:")
+            lines.append("```typescript")
+            for validation in step['validations']:
+                add_block(self._format_validation(validation), "validation")
+            lines.append("```")
+
+        return "\n".join(lines)
+
+    def implemented_by(self, step: Dict[str, Any]) -> str | None:
+        """Name of the existing step definition file implementing step, if any"""
+        if self.step_matcher is None:
+            return None
+        return self.step_matcher.match(step['step'])
+
+    def iter_chunks(self, group_by_scenario: bool = False) -> Iterator[str]:
+        """
+        Yield formatted instruction chunks as steps are read
+
+        Args:
+            group_by_scenario: Yield one chunk per scenario instead of per step
+        """
+        yield self.format_header()
 
         # Add global interceptions
-        if self.instructions.get('global_interceptions'):
-            instructions.append("## Global API Interceptions")
-            instructions.append("```typescript")
-            for interception in self.instructions['global_interceptions']:
-                instructions.append(self._format_api_interception(interception))
-            instructions.append("```\n")
+        global_interceptions = self.format_global_interceptions()
+        if global_interceptions:
+            yield global_interceptions
 
         # Add step-specific instructions
-        instructions.append("## Step-specific Instructions")
-        for step in self.instructions['steps']:
-            instructions.append(f"\n### Step: {step['step']}")
-
-            # Add API interceptions
-            if step.get('api_interceptions'):
-                instructions.append("\nAPI Interceptions:")
-                instructions.append("```typescript")
-                for interception in step['api_interceptions']:
-                    instructions.append(self._format_api_interception(interception))
-                instructions.append("```")
-
-            # Add test data
-            if step.get('test_data') and step['test_data'].get('source'):
-                instructions.append("\nTest Data:")
-                instructions.append(f"Use value from: {step['test_data']['source']}")
-
-            # Add validations
-            if step.get('validations'):
-                instructions.append("\nValidations:")
-                instructions.append("```typescript")
-                for validation in step['validations']:
-                    instructions.append(self._format_validation(validation))
-                instructions.append("```")
-
-        return "\n".join(instructions)
+        yield "## Step-specific Instructions"
+        if group_by_scenario:
+            for scenario in iter_scenarios(self.iter_steps()):
+                yield "\n".join(self.format_step(step) for step in scenario)
+        else:
+            for step in self.iter_steps():
+                yield self.format_step(step)
+
+    def generate_instructions(self) -> str:
+        """Generate formatted instructions from the template"""
+        return "\n".join(self.iter_chunks())
+
+def _is_given(step: Dict[str, Any]) -> bool:
+    return step['step'].lstrip().lower().startswith('given ')
+
+def iter_scenarios(steps: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Group consecutive steps into scenarios; each run of Given steps opens a new one"""
+    current = []
+    for step in steps:
+        if _is_given(step) and current and not _is_given(current[-1]):
+            yield current
+            current = []
+        current.append(step)
+    if current:
+        yield current
 
 def process_instructions(instruction_file: str, test_data_path: str | None = None) -> str:
     """Process instruction file (YAML or CSV) and return formatted instructions"""
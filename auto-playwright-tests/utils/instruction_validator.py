@@ -0,0 +1,154 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+import yaml
+
+DEFAULT_SCHEMA_PATH = Path(__file__).resolve().parent.parent / 'config' / 'instruction_schema.yaml'
+
+# A compiled validator checks a value and appends "path: message" strings to errors
+Validator = Callable[[Any, str, List[str]], None]
+
+_ENUM = re.compile(r'enum\((.*)\)$')
+_SCALAR_TYPES = {
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'object': (dict,),
+}
+
+class InstructionValidationError(ValueError):
+    """Raised when instructions do not match the instruction schema"""
+
+    def __init__(self, source: str, errors: List[str]):
+        self.errors = errors
+        details = "\n".join(f"  - {error}" for error in errors)
+        super().__init__(f"{len(errors)} invalid instruction(s) in {source}:\n{details}")
+
+def _type_name(value: Any) -> str:
+    return type(value).__name__
+
+def _compile_scalar(spec: str) -> Validator:
+    spec = spec.strip()
+    enum = _ENUM.match(spec)
+    if enum:
+        allowed = tuple(option.strip() for option in enum.group(1).split(','))
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {', '.join(allowed)}")
+        return check_enum
+
+    if spec == 'any':
+        return lambda value, path, errors: None
+    if spec not in _SCALAR_TYPES:
+        raise ValueError(f"Unknown schema type: {spec}")
+
+    expected = _SCALAR_TYPES[spec]
+
+    def check_type(value, path, errors):
+        # bool is an int subclass; only accept it where boolean is expected
+        if not isinstance(value, expected) or (isinstance(value, bool) and spec != 'boolean'):
+            errors.append(f"{path}: expected {spec}, got {_type_name(value)}")
+    return check_type
+
+def _compile_list(item_spec: Any) -> Validator:
+    check_item = compile_schema(item_spec)
+
+    def check_list(value, path, errors):
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected list, got {_type_name(value)}")
+            return
+        for index, item in enumerate(value):
+            check_item(item, f"{path}[{index}]", errors)
+    return check_list
+
+def _compile_object(spec: Dict[str, Any]) -> Validator:
+    fields = {}
+    required = []
+    for key, child in spec.items():
+        name = key[:-1] if key.endswith('?') else key
+        if not key.endswith('?'):
+            required.append(name)
+        fields[name] = compile_schema(child)
+
+    def check_object(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected object, got {_type_name(value)}")
+            return
+        for name in required:
+            if name not in value:
+                errors.append(f"{path}.{name}: required field missing")
+        for name, child_value in value.items():
+            check = fields.get(name)
+            if check is None:
+                errors.append(f"{path}.{name}: unknown field")
+            elif child_value is not None or name in required:
+                check(child_value, f"{path}.{name}", errors)
+    return check_object
+
+def compile_schema(spec: Any) -> Validator:
+    """Compile a schema node into a validator function"""
+    if isinstance(spec, dict):
+        return _compile_object(spec)
+    if isinstance(spec, list):
+        if len(spec) != 1:
+            raise ValueError("List schemas must contain exactly one item schema")
+        return _compile_list(spec[0])
+    return _compile_scalar(str(spec))
+
+def _check_step_rules(step: Any, path: str, errors: List[str]):
+    """Cross-field rules the schema language cannot express"""
+    if not isinstance(step, dict):
+        return
+    for index, validation in enumerate(step.get('validations') or []):
+        if isinstance(validation, dict) and validation.get('type') == 'element':
+            for name in ('selector', 'assertion'):
+                if not validation.get(name):
+                    errors.append(f"{path}.validations[{index}].{name}: required when type is 'element'")
+
+class InstructionValidator:
+    """Instruction schema compiled once into validator functions"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        schema = dict(schema)
+        steps = schema.pop('steps')
+        self._check_document = compile_schema(schema)
+        self._check_step = compile_schema(steps[0])
+
+    def validate_document(self, instructions: Dict[str, Any]) -> List[str]:
+        """Validate top-level fields (everything except steps)"""
+        errors = []
+        if not isinstance(instructions, dict):
+            return [f"instructions: expected object, got {_type_name(instructions)}"]
+        document = {key: value for key, value in instructions.items() if key != 'steps'}
+        self._check_document(document, "instructions", errors)
+        if 'steps' not in instructions:
+            errors.append("instructions.steps: required field missing")
+        elif not isinstance(instructions['steps'], list):
+            errors.append(f"instructions.steps: expected list, got {_type_name(instructions['steps'])}")
+        return errors
+
+    def validate_steps(self, steps: Iterable[Any]) -> List[str]:
+        """Validate steps one at a time, so streamed steps need not be materialized"""
+        errors = []
+        for index, step in enumerate(steps):
+            label = step.get('step') if isinstance(step, dict) else None
+            path = f"steps[{index}]" + (f" ({label!r})" if label else "")
+            self._check_step(step, path, errors)
+            _check_step_rules(step, path, errors)
+        return errors
+
+    def validate(self, instructions: Dict[str, Any]) -> List[str]:
+        """Validate a fully loaded instruction model and return every error"""
+        errors = self.validate_document(instructions)
+        if isinstance(instructions, dict) and isinstance(instructions.get('steps'), list):
+            errors.extend(self.validate_steps(instructions['steps']))
+        return errors
+
+@lru_cache(maxsize=8)
+def load_validator(schema_path: str | Path = DEFAULT_SCHEMA_PATH) -> InstructionValidator:
+    """Load and compile an instruction schema (cached per path)"""
+    with open(schema_path) as f:
+        return InstructionValidator(yaml.safe_load(f)['schema'])
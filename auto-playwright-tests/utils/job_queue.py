@@ -0,0 +1,339 @@
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .output_writer import OutputWriter
+
+# Subdirectories of a queue
+_DIRS = ('jobs', 'leases', 'done', 'failed', 'seeds', 'staging', 'results')
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def parse_shard(shard: str | None) -> Optional[Tuple[int, int]]:
+    """Parse "i/n" into (i, n)"""
+    if not shard:
+        return None
+    index, _, count = shard.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Shard must look like i/n, got: {shard}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}: {shard}")
+    return index, count
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """Write JSON atomically"""
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def _portable(path: Path | None) -> Optional[str]:
+    """Path relative to the working directory when inside it, so runners with different checkouts agree"""
+    if path is None:
+        return None
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(Path.cwd()).as_posix()
+    except ValueError:
+        return str(path)
+
+def _copy_tree(source: Path, target: Path):
+    if source.is_dir():
+        shutil.copytree(source, target, dirs_exist_ok=True)
+    else:
+        target.mkdir(parents=True, exist_ok=True)
+
+class Lease:
+    """A claimed job, valid while its lease file still carries this token"""
+
+    def __init__(self, job: Dict[str, Any], worker: str, token: str, attempt: int):
+        self.job = job
+        self.worker = worker
+        self.token = token
+        self.attempt = attempt
+
+    @property
+    def job_id(self) -> str:
+        return self.job['id']
+
+class JobQueue:
+    """Job queue kept in a shared directory, safe for many worker processes and hosts
+
+    Layout under root:
+        jobs/<id>.json      job spec (instruction file, output name, attempts)
+        leases/<id>.json    claim of a running job; created with O_EXCL, so only
+                            one worker wins, and refreshed by heartbeats
+        done/, failed/      markers of finished jobs
+        seeds/<id>/         previous output of the job, so regeneration stays incremental
+        results/<id>/       output of the successful attempt, published by rename
+
+    A lease whose heartbeat is older than lease_seconds is broken by the next
+    worker looking for work and the job counts a failed attempt. Jobs that fail
+    max_attempts times are moved to failed/.
+    """
+
+    def __init__(self, root: str | Path, lease_seconds: float = 120, max_attempts: int = 3):
+        self.root = Path(root)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for name in _DIRS:
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, root: str | Path, config: Dict[str, Any]) -> "JobQueue":
+        return cls(
+            root,
+            lease_seconds=float(config.get("lease_seconds", 120)),
+            max_attempts=int(config.get("max_attempts", 3))
+        )
+
+    def _path(self, kind: str, job_id: str, suffix: str = ".json") -> Path:
+        return self.root / kind / f"{job_id}{suffix}"
+
+    def job_ids(self) -> List[str]:
+        return sorted(path.stem for path in (self.root / 'jobs').glob('*.json'))
+
+    def _remove(self, job_id: str):
+        """Delete a job's spec, markers, lease, seed and result"""
+        for kind in ('jobs', 'done', 'failed', 'leases'):
+            self._path(kind, job_id).unlink(missing_ok=True)
+        for kind in ('seeds', 'results'):
+            shutil.rmtree(self._path(kind, job_id, ''), ignore_errors=True)
+
+    def enqueue(self, instruction_files: Dict[Path, str], output_dir: Path, test_data_path: Path | None = None) -> List[str]:
+        """Replace the queue's jobs with one per instruction file, seeded with its current output directory
+
+        Jobs left over from earlier runs are removed, so their pending work is
+        not claimed and their failures are not reported again.
+
+        Args:
+            instruction_files: Instruction file to its output subdirectory under output_dir
+        """
+        jobs = {}
+        for path, output in instruction_files.items():
+            instructions = _portable(path)
+            jobs[f"{Path(path).stem}-{zlib.crc32(instructions.encode('utf-8')):08x}"] = (instructions, output)
+        for job_id in self.job_ids():
+            if job_id not in jobs:
+                self._remove(job_id)
+
+        ids = []
+        for job_id, (instructions, output) in jobs.items():
+            self._remove(job_id)
+            _copy_tree(Path(output_dir) / output, self._path('seeds', job_id, ''))
+            _write_json(self._path('jobs', job_id), {
+                'id': job_id,
+                'instructions': instructions,
+                'test_data': _portable(test_data_path),
+                'output': output,
+                'attempts': 0,
+                'errors': [],
+            })
+            ids.append(job_id)
+        return ids
+
+    def _finished(self, job_id: str) -> bool:
+        return self._path('done', job_id).exists() or self._path('failed', job_id).exists()
+
+    def _record_failure(self, job_id: str, worker: str, error: str):
+        job = _read_json(self._path('jobs', job_id))
+        if job is None:
+            return
+        job['attempts'] += 1
+        job['errors'].append({'worker': worker, 'error': error, 'at': time.time()})
+        _write_json(self._path('jobs', job_id), job)
+        if job['attempts'] >= self.max_attempts:
+            _write_json(self._path('failed', job_id), job)
+
+    def _break_expired(self, job_id: str) -> bool:
+        """Remove an expired lease; True when the job may be claimed again"""
+        path = self._path('leases', job_id)
+        lease = _read_json(path)
+        try:
+            # A lease being written has no content yet; fall back to its age
+            expires = lease['expires'] if lease else path.stat().st_mtime + self.lease_seconds
+        except FileNotFoundError:
+            return True
+        if expires > time.time():
+            return False
+        # Renaming away the lease is atomic: only one worker gets to break it
+        broken = path.with_name(f"{job_id}.{uuid.uuid4().hex[:8]}.broken")
+        try:
+            os.rename(path, broken)
+        except FileNotFoundError:
+            return True
+        broken.unlink(missing_ok=True)
+        previous = (lease or {}).get('worker', 'unknown')
+        print(f"Reclaimed expired lease on {job_id} from {previous}")
+        self._record_failure(job_id, previous, "lease expired")
+        return not self._finished(job_id)
+
+    def _try_claim(self, job_id: str, worker: str) -> Optional[Lease]:
+        job = _read_json(self._path('jobs', job_id))
+        if job is None:
+            return None
+        token = uuid.uuid4().hex
+        lease = {'worker': worker, 'token': token, 'attempt': job['attempts'] + 1,
+                 'expires': time.time() + self.lease_seconds}
+        path = self._path('leases', job_id)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            if not self._break_expired(job_id):
+                return None
+            return self._try_claim(job_id, worker)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(lease, f)
+        if self._finished(job_id):
+            # Finished between our check and the claim
+            path.unlink(missing_ok=True)
+            return None
+        return Lease(job, worker, token, lease['attempt'])
+
+    def claim(self, worker: str, shard: Optional[Tuple[int, int]] = None) -> Optional[Lease]:
+        """
+        Lease the next unfinished job
+
+        With a shard (index, count), jobs hashing to this shard are tried first
+        and the others afterwards, so idle workers steal from slow shards.
+        """
+        pending = [job_id for job_id in self.job_ids() if not self._finished(job_id)]
+        if shard:
+            index, count = shard
+            pending.sort(key=lambda job_id: zlib.crc32(job_id.encode('utf-8')) % count != index)
+        for job_id in pending:
+            lease = self._try_claim(job_id, worker)
+            if lease:
+                return lease
+        return None
+
+    def owns(self, lease: Lease) -> bool:
+        current = _read_json(self._path('leases', lease.job_id))
+        return bool(current) and current.get('token') == lease.token
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend the lease; False once it has been lost to another worker"""
+        path = self._path('leases', lease.job_id)
+        if not self.owns(lease):
+            return False
+        # Stage the renewal first so the token check and the replace are back to back
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp_path.write_text(json.dumps({
+            'worker': lease.worker, 'token': lease.token, 'attempt': lease.attempt,
+            'expires': time.time() + self.lease_seconds,
+        }, indent=1), encoding="utf-8")
+        current = _read_json(path)
+        # An expired lease may be being broken right now, so it is never renewed
+        if not current or current.get('token') != lease.token or current.get('expires', 0) <= time.time():
+            tmp_path.unlink(missing_ok=True)
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+    def staging_dir(self, lease: Lease) -> Path:
+        """Private output directory for this attempt, starting from the job's previous output"""
+        staging = self._path('staging', f"{lease.job_id}.{lease.token[:8]}", '')
+        shutil.rmtree(staging, ignore_errors=True)
+        _copy_tree(self._path('seeds', lease.job_id, ''), staging)
+        return staging
+
+    def complete(self, lease: Lease, staging: Path, summary: Dict[str, Any] | None = None) -> bool:
+        """Publish the attempt's output; False if the lease was lost and the output discarded"""
+        result = self._path('results', lease.job_id, '')
+        if not self.owns(lease):
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        try:
+            os.rename(staging, result)
+        except OSError:
+            # Another attempt already published
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        _write_json(self._path('done', lease.job_id), {
+            **lease.job, 'worker': lease.worker, 'attempt': lease.attempt,
+            'finished': time.time(), **(summary or {}),
+        })
+        self._path('leases', lease.job_id).unlink(missing_ok=True)
+        return True
+
+    def fail(self, lease: Lease, error: Exception | str, staging: Path | None = None):
+        """Release the lease after a failed attempt"""
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        if not self.owns(lease):
+            return
+        self._record_failure(lease.job_id, lease.worker, str(error))
+        self._path('leases', lease.job_id).unlink(missing_ok=True)
+
+    def merge(self, job_id: str, output_dir: Path, max_workers: int = 4) -> Dict[str, int]:
+        """
+        Mirror a job's published result into output_dir/<output name>
+
+        Changed files are replaced atomically; files that were in the seed but
+        are no longer produced are removed, anything else in the target is kept.
+        """
+        job = _read_json(self._path('jobs', job_id))
+        result = self._path('results', job_id, '')
+        seed = self._path('seeds', job_id, '')
+        target = Path(output_dir) / job['output']
+        target.mkdir(parents=True, exist_ok=True)
+        counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+
+        produced = {path.relative_to(result) for path in result.rglob('*') if path.is_file()}
+        with OutputWriter(max_workers=max_workers) as writer:
+            futures = [writer.write(target / relative, (result / relative).read_bytes()) for relative in sorted(produced)]
+        for future in futures:
+            future.result()
+        counts['written'], counts['unchanged'] = writer.written, writer.unchanged
+        for path in seed.rglob('*'):
+            relative = path.relative_to(seed)
+            if path.is_file() and relative not in produced and (target / relative).exists():
+                (target / relative).unlink()
+                counts['removed'] += 1
+
+        _write_json(self._path('done', job_id), {**_read_json(self._path('done', job_id)), 'merged': time.time()})
+        return counts
+
+    def unmerged(self) -> List[str]:
+        """Finished jobs whose result has not been merged yet"""
+        ids = []
+        for path in sorted((self.root / 'done').glob('*.json')):
+            done = _read_json(path)
+            if done and 'merged' not in done:
+                ids.append(path.stem)
+        return ids
+
+    def status(self) -> Dict[str, int]:
+        ids = self.job_ids()
+        done = sum(1 for job_id in ids if self._path('done', job_id).exists())
+        failed = sum(1 for job_id in ids if self._path('failed', job_id).exists())
+        leased = sum(1 for job_id in ids if self._path('leases', job_id).exists() and not self._finished(job_id))
+        return {
+            'jobs': len(ids),
+            'pending': len(ids) - done - failed - leased,
+            'leased': leased,
+            'done': done,
+            'failed': failed,
+        }
+
+    def finished(self) -> bool:
+        return all(self._finished(job_id) for job_id in self.job_ids())
+
+    def failures(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            path.stem: _read_json(path) or {}
+            for path in sorted((self.root / 'failed').glob('*.json'))
+        }
@@ -1,23 +1,100 @@
 import time
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from abc import ABC, abstractmethod
-from tenacity import retry, stop_after_attempt, wait_fixed
+from .completion_cache import CompletionCache
+from .rate_limiter import RetryScheduler
+from .telemetry import Telemetry, continue_span, current_frame, current_span
+from .response_parser import parse_files, iter_files
+from .prompt_builder import estimate_tokens
+
+# Shared by every provider and never varied, so it stays part of a cacheable prompt prefix
+SYSTEM_MESSAGE = "You are a test automation expert specializing in Playwright with TypeScript and Cucumber."
+
+def split_prefix(prompt: str, prefix: Optional[str]) -> Tuple[str, str]:
+    """Split a prompt into its cacheable prefix and the remainder ("" prefix if it does not match)"""
+    if prefix and prompt.startswith(prefix):
+        return prefix, prompt[len(prefix):]
+    return "", prompt
 
 class LLMProvider(ABC):
+    # Upper bound on concurrent requests issued by agenerate_completions
+    max_concurrency: int = 4
+
     @abstractmethod
     def generate_completion(self, prompt: str, **kwargs) -> str:
         """Generate completion from the LLM provider"""
         pass
 
+    def generate_completions(self, prompts: List[str], **kwargs) -> List[str]:
+        """
+        Generate multiple completions concurrently, capped at max_concurrency
+
+        With return_exceptions=True a failed prompt yields its exception in place of a completion.
+        """
+        import asyncio
+        return asyncio.run(self.agenerate_completions(prompts, **kwargs))
+
+    async def agenerate_completion(self, prompt: str, **kwargs) -> str:
+        """Generate completion without blocking the event loop"""
+        import asyncio
+        # Usage reported from the worker thread belongs to the caller's span
+        frame = current_frame()
+
+        def call() -> str:
+            with continue_span(frame):
+                return self.generate_completion(prompt, **kwargs)
+
+        return await asyncio.to_thread(call)
+
+    async def agenerate_completions(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate multiple completions concurrently, capped at max_concurrency"""
+        import asyncio
+        semaphore = asyncio.Semaphore(kwargs.pop("max_concurrency", self.max_concurrency))
+        return_exceptions = kwargs.pop("return_exceptions", False)
+
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate_completion(prompt, **kwargs)
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts), return_exceptions=return_exceptions)
+
+    def stream_completion(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield completion text as it arrives; providers without streaming yield it whole"""
+        yield self.generate_completion(prompt, **kwargs)
+
+    def sampling_params(self, **kwargs) -> Dict[str, Any]:
+        """Effective model and sampling parameters for a call, used for cache keys"""
+        return {}
+
 class LLMHandler:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], telemetry: Optional[Telemetry] = None):
         """Initialize LLM handler with configuration"""
         self.config = config
+        self.telemetry = telemetry or Telemetry()
+        self.provider_name = self.config.get("provider", "openai").lower()
         self.provider = self._initialize_provider()
+        # Static start of every prompt (the base prompt); providers mark it cacheable
+        self.prompt_prefix: Optional[str] = None
+        self.cache = self._initialize_cache()
+        self._slots = threading.BoundedSemaphore(self._max_concurrency())
+        self.scheduler = RetryScheduler(self.provider_name, self.config.get(self.provider_name) or {})
+
+    def _max_concurrency(self) -> int:
+        """Maximum number of in-flight requests allowed for the configured provider"""
+        provider_config = self.config.get(self.provider_name) or {}
+        return max(1, int(provider_config.get("max_concurrency", 4)))
         
+    def _initialize_cache(self) -> Optional[CompletionCache]:
+        """Initialize the completion cache unless disabled in config"""
+        cache_config = self.config.get("cache") or {}
+        if not cache_config.get("enabled", True):
+            return None
+        return CompletionCache.from_config(cache_config)
+
     def _initialize_provider(self) -> LLMProvider:
         """Initialize the appropriate LLM provider based on config"""
-        provider_name = self.config.get("provider", "openai").lower()
+        provider_name = self.provider_name
         
         if provider_name == "openai":
             from .openai_provider import OpenAIProvider
@@ -28,41 +105,200 @@ class LLMHandler:
         elif provider_name == "codey":
             from .codey_client import CodeyProvider
             return CodeyProvider(self.config["codey"])
+        elif provider_name == "fake":
+            from .fake_provider import FakeProvider
+            return FakeProvider(self.config.get("fake") or {})
         else:
             raise ValueError(f"Unsupported LLM provider: {provider_name}")
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(5),
-        retry_error_callback=lambda retry_state: retry_state.outcome.result()
-    )
-    def generate_test(self, prompt: str, **kwargs) -> str:
-        """Generate test code using configured LLM provider"""
+    def generate_test(self, prompt: str, use_cache: bool = True, **kwargs) -> str:
+        """Generate test code using configured LLM provider, serving repeats from cache"""
+        params = self.provider.sampling_params(**kwargs)
+        with self.telemetry.span("llm.generate_test", provider=self.provider_name,
+                                 model=params.get("model"), cache_hits=0, retries=0) as span:
+            if not (use_cache and self.cache):
+                return self._generate_uncached(prompt, **kwargs)
+
+            key = CompletionCache.make_key(self.provider_name, params, prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print("Using cached completion")
+                span["cache_hits"] = 1
+                return cached
+
+            response = self._generate_uncached(prompt, **kwargs)
+            self.cache.set(key, response, {"provider": self.provider_name})
+            return response
+
+    def generate_tests(self, prompts: List[str], use_cache: bool = True, **kwargs) -> List[str]:
+        """Generate completions for several prompts, sending cache misses to the provider as one batch"""
+        if len(prompts) == 1:
+            return [self.generate_test(prompts[0], use_cache=use_cache, **kwargs)]
+
+        params = self.provider.sampling_params(**kwargs)
+        with self.telemetry.span("llm.generate_tests", provider=self.provider_name, model=params.get("model"),
+                                 prompts=len(prompts), cache_hits=0, retries=0) as span:
+            responses: List[Optional[str]] = [None] * len(prompts)
+            keys: List[Optional[str]] = [None] * len(prompts)
+            if use_cache and self.cache:
+                for index, prompt in enumerate(prompts):
+                    keys[index] = CompletionCache.make_key(self.provider_name, params, prompt)
+                    responses[index] = self.cache.get(keys[index])
+                span["cache_hits"] = sum(1 for response in responses if response is not None)
+                if span["cache_hits"]:
+                    print(f"Using {span['cache_hits']} cached completion(s)")
+
+            missing = [index for index, response in enumerate(responses) if response is None]
+            if missing:
+                generated = self._generate_batch_uncached([prompts[index] for index in missing], **kwargs)
+                for index, response in zip(missing, generated):
+                    responses[index] = response
+                    if keys[index]:
+                        self.cache.set(keys[index], response, {"provider": self.provider_name})
+            return responses
+
+    def _provider_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Call arguments for the provider, including the cacheable prompt prefix"""
+        if self.prompt_prefix:
+            return {**kwargs, "prefix": self.prompt_prefix}
+        return kwargs
+
+    def _call_provider_batch(self, prompts: List[str], **kwargs) -> List[Any]:
+        """Send prompts as one batch, returning a completion or the exception for each"""
+        # One handler slot per batch; the provider bounds its own fan-out with max_concurrency
+        with self._slots, self.telemetry.span("llm.generate_completions", prompts=len(prompts)) as span:
+            responses = self.provider.generate_completions(
+                prompts, return_exceptions=True, **self._provider_kwargs(kwargs)
+            )
+            completed = [(prompt, response) for prompt, response in zip(prompts, responses)
+                         if not isinstance(response, BaseException)]
+            span["failed"] = len(prompts) - len(completed)
+            if "prompt_tokens" not in span:
+                span["prompt_tokens"] = sum(estimate_tokens(prompt) for prompt, _ in completed)
+            if "completion_tokens" not in span:
+                span["completion_tokens"] = sum(estimate_tokens(response or "") for _, response in completed)
+            return responses
+
+    def _generate_batch_uncached(self, prompts: List[str], **kwargs) -> List[str]:
+        """Send a batch through the rate limiter, resubmitting only the prompts that failed"""
+        model = self.provider.sampling_params(**kwargs).get("model")
         try:
-            return self.provider.generate_completion(prompt, **kwargs)
+            return self.scheduler.run_batch(
+                lambda indices: self._call_provider_batch([prompts[index] for index in indices], **kwargs),
+                len(prompts),
+                model=model,
+                on_retry=self._record_retry,
+                on_wait=self._record_wait
+            )
         except Exception as e:
             print(f"Error during test generation: {str(e)}")
             raise
 
+    def _call_provider(self, prompt: str, **kwargs) -> str:
+        with self._slots, self.telemetry.span("llm.generate_completion") as span:
+            response = self.provider.generate_completion(prompt, **self._provider_kwargs(kwargs))
+            # Providers report exact usage when the API returns it; otherwise estimate
+            if "prompt_tokens" not in span:
+                span["prompt_tokens"] = estimate_tokens(prompt)
+            if "completion_tokens" not in span:
+                span["completion_tokens"] = estimate_tokens(response or "")
+            return response
+
+    def _record_retry(self, attempt: int, error: Exception, delay: float):
+        span = current_span()
+        if span is not None:
+            span["retries"] = span.get("retries", 0) + 1
+        print(f"Retry {attempt} in {delay:.1f}s after error: {str(error)}")
+
+    @staticmethod
+    def _record_wait(seconds: float):
+        span = current_span()
+        if span is not None:
+            span["limiter_wait_ms"] = span.get("limiter_wait_ms", 0) + round(seconds * 1000)
+
+    def _generate_uncached(self, prompt: str, **kwargs) -> str:
+        """Call the provider through the shared rate limiter, retrying transient failures"""
+        model = self.provider.sampling_params(**kwargs).get("model")
+        try:
+            return self.scheduler.run(
+                lambda: self._call_provider(prompt, **kwargs),
+                model=model,
+                on_retry=self._record_retry,
+                on_wait=self._record_wait
+            )
+        except Exception as e:
+            print(f"Error during test generation: {str(e)}")
+            raise
+
+    def generate_test_stream(self, prompt: str, use_cache: bool = True, **kwargs) -> Iterator[Tuple[str, str]]:
+        """Stream generated files, yielding (filename, content) as each block closes"""
+        with self.telemetry.span("llm.generate_test_stream", provider=self.provider_name,
+                                 cache_hits=0, retries=0) as span:
+            yield from self._generate_test_stream(span, prompt, use_cache, **kwargs)
+
+    def _generate_test_stream(self, span: Dict[str, Any], prompt: str, use_cache: bool, **kwargs) -> Iterator[Tuple[str, str]]:
+        model = self.provider.sampling_params(**kwargs).get("model")
+        span["model"] = model
+        if not (use_cache and self.cache):
+            yield from iter_files(self._open_stream(prompt, model, **kwargs))
+            span.setdefault("prompt_tokens", estimate_tokens(prompt))
+            return
+
+        key = CompletionCache.make_key(
+            self.provider_name,
+            self.provider.sampling_params(**kwargs),
+            prompt
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            print("Using cached completion")
+            span["cache_hits"] = 1
+            yield from iter_files([cached])
+            return
+
+        # Chunks are kept only to populate the cache once the stream completes
+        chunks = []
+
+        def record(stream: Iterator[str]) -> Iterator[str]:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+
+        yield from iter_files(record(self._open_stream(prompt, model, **kwargs)))
+        response = "".join(chunks)
+        # Providers report exact usage when the API returns it; otherwise estimate
+        span.setdefault("prompt_tokens", estimate_tokens(prompt))
+        span.setdefault("completion_tokens", estimate_tokens(response))
+        self.cache.set(key, response, {"provider": self.provider_name})
+
+    def _open_stream(self, prompt: str, model: Optional[str], **kwargs) -> Iterator[str]:
+        """
+        Stream a completion, opening it through the rate limiter and retrying until the first chunk arrives
+
+        Failures after the first chunk are not retried, since its files have already been yielded.
+        """
+        def open_stream() -> Tuple[Iterator[str], Optional[str]]:
+            self._slots.acquire()
+            try:
+                stream = self.provider.stream_completion(prompt, **self._provider_kwargs(kwargs))
+                return stream, next(stream, None)
+            except BaseException:
+                self._slots.release()
+                raise
+
+        stream, first = self.scheduler.run(
+            open_stream,
+            model=model,
+            on_retry=self._record_retry,
+            on_wait=self._record_wait
+        )
+        try:
+            if first is not None:
+                yield first
+            yield from stream
+        finally:
+            self._slots.release()
+
     def parse_response(self, response: str) -> Dict[str, str]:
         """Parse the LLM response into separate files"""
-        # TODO: Implement smarter response parsing
-        files = {}
-        current_file = None
-        current_content = []
-        
-        for line in response.split('\n'):
-            if line.startswith('```') and len(line) > 3:
-                # New file block
-                file_info = line[3:].strip()
-                if ':' in file_info:
-                    current_file = file_info.split(':')[1].strip()
-                    current_content = []
-            elif line.startswith('```') and current_file:
-                # End of file block
-                files[current_file] = '\n'.join(current_content)
-                current_file = None
-            elif current_file:
-                current_content.append(line)
-        
-        return files if files else {"test.spec.ts": response} 
\ No newline at end of file
+        return parse_files(response)
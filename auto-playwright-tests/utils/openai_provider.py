@@ -1,41 +1,102 @@
-import time
-from typing import Dict, List, Any
-from openai import OpenAI
-from .llm import LLMProvider
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Any
+from .llm import LLMProvider, SYSTEM_MESSAGE, split_prefix
+from .telemetry import report_usage
 
 class OpenAIProvider(LLMProvider):
     def __init__(self, config: Dict[str, Any]):
         """Initialize OpenAI provider with configuration"""
         self.config = config
-        self.client = OpenAI(api_key=config["api_key"])
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = config.get("model", "gpt-4-turbo-preview")
         self.max_tokens = config.get("max_tokens", 4000)
         self.temperature = config.get("temperature", 0.2)
         self.timeout = config.get("request_timeout", 300)
-        self.retry_delay = config.get("retry_delay", 5)
+        self.max_concurrency = config.get("max_concurrency", 4)
+
+    @property
+    def client(self):
+        """SDK client, imported and created on first use so startup stays cheap"""
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI
+                # The SDK client keeps its own keep-alive connection pool
+                self._client = OpenAI(api_key=self.config["api_key"], base_url=self.config.get("base_url"))
+            return self._client
+
+    def sampling_params(self, **kwargs) -> Dict[str, Any]:
+        """Effective model and sampling parameters for a call"""
+        return {
+            "model": kwargs.get("model", self.model),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens)
+        }
+
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        # The system message and the base prompt opening the user message are
+        # byte-identical across requests, so OpenAI's automatic prefix caching applies
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _cache_options(prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Route requests sharing a prefix to the same prompt cache"""
+        prefix, _ = split_prefix(prompt, kwargs.get("prefix"))
+        if not prefix:
+            return {}
+        key = hashlib.sha256((SYSTEM_MESSAGE + prefix).encode("utf-8")).hexdigest()[:32]
+        return {"extra_body": {"prompt_cache_key": key}}
+
+    @staticmethod
+    def _report_usage(usage: Any):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        report_usage(usage.prompt_tokens, usage.completion_tokens, cached)
 
     def generate_completion(self, prompt: str, **kwargs) -> str:
         """Generate completion using OpenAI API"""
         try:
             response = self.client.chat.completions.create(
                 model=kwargs.get("model", self.model),
-                messages=[
-                    {"role": "system", "content": "You are a test automation expert specializing in Playwright with TypeScript and Cucumber."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._messages(prompt),
                 temperature=kwargs.get("temperature", self.temperature),
                 max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                timeout=kwargs.get("timeout", self.timeout)
+                timeout=kwargs.get("timeout", self.timeout),
+                **self._cache_options(prompt, kwargs)
             )
             
+            self._report_usage(getattr(response, "usage", None))
             return response.choices[0].message.content
             
         except Exception as e:
-            if "rate_limit" in str(e).lower():
-                print("Rate limit reached, waiting before retry...")
-                time.sleep(self.retry_delay)
-            raise Exception(f"Error calling OpenAI API: {str(e)}")
-
-    def generate_completions(self, prompts: List[str], **kwargs) -> List[str]:
-        """Generate multiple completions"""
-        return [self.generate_completion(prompt, **kwargs) for prompt in prompts] 
\ No newline at end of file
+            # Backoff and Retry-After handling live in LLMHandler's retry scheduler
+            raise Exception(f"Error calling OpenAI API: {str(e)}") from e
+
+    def stream_completion(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Stream completion text from the OpenAI API as it is generated"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=kwargs.get("model", self.model),
+                messages=self._messages(prompt),
+                temperature=kwargs.get("temperature", self.temperature),
+                max_tokens=kwargs.get("max_tokens", self.max_tokens),
+                timeout=kwargs.get("timeout", self.timeout),
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._cache_options(prompt, kwargs)
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                # The final chunk carries usage and no choices
+                self._report_usage(getattr(chunk, "usage", None))
+
+        except Exception as e:
+            raise Exception(f"Error calling OpenAI API: {str(e)}") from e
\ No newline at end of file
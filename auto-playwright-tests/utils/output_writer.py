@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Set
+
+_HASH_CHUNK = 1024 * 1024
+
+def file_digest(path: Path) -> str | None:
+    """SHA-256 of a file read in chunks, or None if it does not exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return digest.hexdigest()
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # pragma: no cover - directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class OutputWriter:
+    """Write generated files atomically on a small thread pool, skipping unchanged ones
+
+    Each file is compared with the existing one by hash; changed files are
+    written to a temporary file in the same directory, flushed to disk and
+    renamed over the target, so a crash never leaves a half-written file. The
+    containing directories are fsynced once per batch in close() rather than
+    after every rename.
+    """
+
+    def __init__(self, max_workers: int = 4, fsync: bool = True):
+        self.fsync = fsync
+        self.written = 0
+        self.unchanged = 0
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="output-writer")
+        self._lock = threading.Lock()
+        self._dirty_dirs: Set[Path] = set()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, path: Path, content: str | bytes) -> "Future[bool]":
+        """Queue a write; the future resolves to True if the file changed"""
+        return self._executor.submit(self._write, Path(path), content)
+
+    def _write(self, path: Path, content: str | bytes) -> bool:
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        if file_digest(path) == hashlib.sha256(data).hexdigest():
+            with self._lock:
+                self.unchanged += 1
+            return False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.written += 1
+            self._dirty_dirs.add(path.parent)
+        return True
+
+    def close(self) -> Dict[str, int]:
+        """Wait for queued writes, make the renames durable and return written/unchanged counts"""
+        self._executor.shutdown(wait=True)
+        if self.fsync:
+            for directory in self._dirty_dirs:
+                _fsync_dir(directory)
+        self._dirty_dirs.clear()
+        return {'written': self.written, 'unchanged': self.unchanged}
@@ -0,0 +1,260 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
+
+# Code-mode tokens. Every alternative consumes input without nested quantifiers,
+# so scanning is linear even on unbalanced sources.
+_CODE_TOKEN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | (?P<template>`)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<word>\w+)
+  | (?P<open>[{(\[])
+  | (?P<close>[})\]])
+  | (?P<other>[^\s\w$"'`{}()\[\]/]+|/)
+''', re.DOTALL | re.VERBOSE)
+
+# Template-literal tokens: text, ${ expression openers and the closing backtick
+_TEMPLATE_TOKEN = re.compile(r'(?P<end>`)|(?P<expr>\$\{)|(?P<text>(?:[^`\\$]|\\.|\$(?!\{))+|\\|\$)', re.DOTALL)
+
+_PAIRS = {'}': '{', ')': '(', ']': '['}
+_IDENT = re.compile(r'[A-Za-z_$][\w$]*')
+
+class SourceScan:
+    """Single pass over a TypeScript source
+
+    Records the matching close position of every bracket and the positions of
+    trigger identifiers found outside strings and comments.
+    """
+
+    def __init__(self, source: str, triggers: Set[str]):
+        self.source = source
+        self.matching: Dict[int, int] = {}
+        self.hits: List[Tuple[int, str]] = []
+        self._scan(triggers)
+
+    def _scan(self, triggers: Set[str]):
+        source = self.source
+        length = len(source)
+        stack: List[Tuple[str, int]] = []
+        in_template = False
+        pos = 0
+
+        while pos < length:
+            if in_template:
+                match = _TEMPLATE_TOKEN.match(source, pos)
+                if match.lastgroup == 'end':
+                    in_template = False
+                elif match.lastgroup == 'expr':
+                    stack.append(('${', pos + 1))
+                    in_template = False
+                pos = match.end()
+                continue
+
+            match = _CODE_TOKEN.match(source, pos)
+            kind = match.lastgroup
+            if kind == 'ident':
+                if match.group() in triggers:
+                    self.hits.append((pos, match.group()))
+            elif kind == 'open':
+                stack.append((source[pos], pos))
+            elif kind == 'close':
+                opener = _PAIRS[source[pos]]
+                if stack and (stack[-1][0] == opener or (opener == '{' and stack[-1][0] == '${')):
+                    bracket, open_pos = stack.pop()
+                    self.matching[open_pos] = pos
+                    if bracket == '${':
+                        in_template = True
+            elif kind == 'template':
+                in_template = True
+            pos = match.end()
+
+    def skip_ws(self, pos: int) -> int:
+        """Position of the next non-whitespace character at or after pos"""
+        source = self.source
+        while pos < len(source) and source[pos].isspace():
+            pos += 1
+        return pos
+
+    def char_at(self, pos: int) -> str:
+        return self.source[pos] if pos < len(self.source) else ''
+
+    def ident_at(self, pos: int) -> str:
+        match = _IDENT.match(self.source, pos)
+        return match.group() if match else ''
+
+    def block_end(self, open_pos: int) -> Optional[int]:
+        """Position just past the bracket matching the one at open_pos"""
+        close = self.matching.get(open_pos)
+        return close + 1 if close is not None else None
+
+    def line_start(self, pos: int) -> int:
+        """Position of the first non-blank character on pos's line"""
+        return min(self.skip_ws(self.source.rfind('\n', 0, pos) + 1), pos)
+
+@dataclass
+class PatternSpec:
+    """A kind of pattern extracted from repository sources
+
+    Attributes:
+        pattern_type: Key in RepoContext.patterns the matches are stored under
+        label: Value of each match's 'type' field
+        kinds: File kinds to scan ('base_page', 'page_object', 'step_definition', 'feature')
+        triggers: Identifiers that start a candidate match
+        extract: Callable(scan, position, trigger) returning (start, end) or None
+        include_name: Add the file name to each match
+    """
+    pattern_type: str
+    label: str
+    kinds: Tuple[str, ...]
+    triggers: Tuple[str, ...]
+    extract: Callable[[SourceScan, int, str], Optional[Tuple[int, int]]]
+    include_name: bool = False
+
+class PatternRegistry:
+    """Registry of pattern kinds, applied to each file in one shared scan"""
+
+    def __init__(self):
+        self._specs: List[PatternSpec] = []
+        self._fingerprint: Optional[str] = None
+
+    def register(self, spec: PatternSpec) -> PatternSpec:
+        self._specs.append(spec)
+        self._fingerprint = None
+        return spec
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the registered specs; patterns extracted under another fingerprint are stale"""
+        if self._fingerprint is None:
+            described = [
+                (spec.pattern_type, spec.label, spec.kinds, spec.triggers,
+                 f"{spec.extract.__module__}.{spec.extract.__qualname__}", spec.include_name)
+                for spec in self._specs
+            ]
+            self._fingerprint = hashlib.sha256(repr(described).encode("utf-8")).hexdigest()[:16]
+        return self._fingerprint
+
+    @property
+    def pattern_types(self) -> List[str]:
+        return list(dict.fromkeys(spec.pattern_type for spec in self._specs))
+
+    def extract(self, kind: str, name: str, content: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Extract every registered pattern that applies to a file of this kind"""
+        specs = [spec for spec in self._specs if kind in spec.kinds]
+        if not specs:
+            return {}
+
+        by_trigger: Dict[str, List[PatternSpec]] = {}
+        for spec in specs:
+            for trigger in spec.triggers:
+                by_trigger.setdefault(trigger, []).append(spec)
+
+        scan = SourceScan(content, set(by_trigger))
+        patterns = {spec.pattern_type: [] for spec in specs}
+        covered_until: Dict[int, int] = {}
+
+        for pos, trigger in scan.hits:
+            for spec in by_trigger[trigger]:
+                # Skip triggers nested inside a previous match of the same spec
+                if pos < covered_until.get(id(spec), -1):
+                    continue
+                extent = spec.extract(scan, pos, trigger)
+                if not extent:
+                    continue
+                start, end = extent
+                covered_until[id(spec)] = end
+                match = {'type': spec.label}
+                if spec.include_name:
+                    match['name'] = name
+                match['pattern'] = content[start:end].strip()
+                patterns[spec.pattern_type].append(match)
+
+        return patterns
+
+def _extract_locators(scan: SourceScan, pos: int, trigger: str) -> Optional[Tuple[int, int]]:
+    """`locators = { ... }` declared with let/const/var or as a (readonly) class field"""
+    after = scan.skip_ws(pos + len(trigger))
+    if scan.char_at(after) == ':':
+        # Skip a type annotation up to the assignment
+        after = scan.source.find('=', after)
+        if after < 0:
+            return None
+    if scan.char_at(after) != '=' or scan.char_at(after + 1) in ('=', '>'):
+        return None
+    brace = scan.skip_ws(after + 1)
+    if scan.char_at(brace) != '{':
+        return None
+    end = scan.block_end(brace)
+    if end is None:
+        return None
+
+    start = scan.line_start(pos)
+    declaration = scan.source[start:pos].split()
+    if not declaration or declaration[-1] not in ('let', 'const', 'var', 'readonly', 'private', 'public', 'protected', 'static'):
+        return None
+    if scan.char_at(end) == ';':
+        end += 1
+    return start, end
+
+def _extract_response_handling(scan: SourceScan, pos: int, trigger: str) -> Optional[Tuple[int, int]]:
+    """A waitForResponse/getResponsePromise call, or a method of that name with its body"""
+    paren = scan.skip_ws(pos + len(trigger))
+    if scan.char_at(paren) != '(':
+        return None
+    end = scan.block_end(paren)
+    if end is None:
+        return None
+
+    body = scan.skip_ws(end)
+    if scan.char_at(body) == '{' and scan.block_end(body):
+        end = scan.block_end(body)
+    elif scan.char_at(end) == ';':
+        end += 1
+    return scan.line_start(pos), end
+
+def _extract_try_catch(scan: SourceScan, pos: int, trigger: str) -> Optional[Tuple[int, int]]:
+    """A try block with its catch (and optional finally) block"""
+    brace = scan.skip_ws(pos + len(trigger))
+    if scan.char_at(brace) != '{' or scan.block_end(brace) is None:
+        return None
+    cursor = scan.skip_ws(scan.block_end(brace))
+    if scan.ident_at(cursor) != 'catch':
+        return None
+
+    cursor = scan.skip_ws(cursor + len('catch'))
+    if scan.char_at(cursor) == '(':
+        if scan.block_end(cursor) is None:
+            return None
+        cursor = scan.skip_ws(scan.block_end(cursor))
+    if scan.char_at(cursor) != '{' or scan.block_end(cursor) is None:
+        return None
+    end = scan.block_end(cursor)
+
+    finally_pos = scan.skip_ws(end)
+    if scan.ident_at(finally_pos) == 'finally':
+        brace = scan.skip_ws(finally_pos + len('finally'))
+        if scan.char_at(brace) == '{' and scan.block_end(brace):
+            end = scan.block_end(brace)
+    return pos, end
+
+DEFAULT_REGISTRY = PatternRegistry()
+DEFAULT_REGISTRY.register(PatternSpec(
+    'response_handling', 'response', ('step_definition',),
+    ('waitForResponse', 'getResponsePromise'), _extract_response_handling
+))
+DEFAULT_REGISTRY.register(PatternSpec(
+    'page_objects', 'locators', ('page_object',),
+    ('locators',), _extract_locators, include_name=True
+))
+DEFAULT_REGISTRY.register(PatternSpec(
+    'error_handling', 'error', ('base_page',),
+    ('try',), _extract_try_catch
+))
+
+def register_pattern(spec: PatternSpec) -> PatternSpec:
+    """Add a pattern kind to the default registry used by RepoContext"""
+    return DEFAULT_REGISTRY.register(spec)
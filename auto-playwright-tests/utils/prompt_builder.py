@@ -0,0 +1,276 @@
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .instruction_processor import InstructionProcessor, iter_scenarios
+
+
+# Context windows for known model families, matched by longest prefix
+CONTEXT_WINDOWS = {
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "claude-3": 200000,
+    "code-bison": 6144,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Average number of steps per run when scenarios are split for incremental regeneration
+RUN_BOUNDARY_STEPS = 8
+
+_encodings = {}
+_tiktoken = None
+
+def _load_tiktoken():
+    """Import tiktoken on first use; False when it is not installed"""
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken
+        except ImportError:  # pragma: no cover - optional dependency
+            _tiktoken = False
+    return _tiktoken
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Estimate token count with tiktoken when available, else ~4 chars per token"""
+    tiktoken = _load_tiktoken()
+    if not tiktoken:
+        return (len(text) + 3) // 4
+    name = model or "gpt-4"
+    if name not in _encodings:
+        try:
+            _encodings[name] = tiktoken.encoding_for_model(name)
+        except KeyError:
+            _encodings[name] = tiktoken.get_encoding("cl100k_base")
+    return len(_encodings[name].encode(text, disallowed_special=()))
+
+def context_window_for(model: Optional[str]) -> int:
+    """Look up the context window for a model name"""
+    if model:
+        for prefix in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+            if model.startswith(prefix):
+                return CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+CONTINUATION_NOTE = (
+    "Continue the files from the previous parts: output only the new "
+    "scenarios, step definitions and page object members. Do not repeat "
+    "the Feature header, imports or class declarations."
+)
+
+RESUME_NOTE = (
+    "The first steps below continue the last scenario of the previous parts; "
+    "add them to that scenario instead of opening a new one."
+)
+
+class PromptBuilder:
+    """Assemble size-aware prompts from a base prompt and processed instructions
+
+    Repeated interception and validation blocks are collapsed to references, and
+    instruction sets that would overflow the model's context window are split
+    into several prompts along scenario boundaries.
+    """
+
+    def __init__(self, base_prompt: str, model: Optional[str] = None,
+                 context_window: Optional[int] = None, reserve_tokens: int = 4000,
+                 compact: bool = True):
+        self.base_prompt = base_prompt
+        self.model = model
+        self.context_window = context_window or context_window_for(model)
+        self.reserve_tokens = reserve_tokens
+        self.compact = compact
+        self.section_tokens: Dict[str, int] = {}
+
+    def _count(self, text: str) -> int:
+        return estimate_tokens(text, self.model)
+
+    def _preamble(self, processor: InstructionProcessor) -> str:
+        """Base prompt and shared instructions, resetting the section token counts"""
+        header = processor.format_header()
+        global_interceptions = processor.format_global_interceptions()
+        preamble = f"{self.base_prompt}\n\nTest Instructions:\n{header}"
+        if global_interceptions:
+            preamble += f"\n{global_interceptions}"
+        preamble += "\n## Step-specific Instructions"
+
+        self.section_tokens = {
+            "base_prompt": self._count(self.base_prompt),
+            "global_interceptions": self._count(global_interceptions),
+            "steps": 0,
+        }
+        return preamble
+
+    def _budget(self, preamble: str) -> int:
+        """Tokens left for step instructions in each prompt"""
+        budget = self.context_window - self.reserve_tokens - self._count(preamble) - 100
+        if budget <= 0:
+            raise ValueError(
+                f"Base prompt needs {self._count(preamble)} tokens, which leaves no room "
+                f"in a {self.context_window} token context window"
+            )
+        return budget
+
+    def _pack(self, processor: InstructionProcessor, scenarios: Iterable[List[Dict[str, Any]]],
+              budget: int) -> List[List[str]]:
+        """Pack formatted scenarios into parts that each fit the budget"""
+        parts: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        seen_blocks: Optional[Dict[str, str]] = {} if self.compact else None
+
+        for scenario in scenarios:
+            scenario_text = [processor.format_step(step, seen_blocks) for step in scenario]
+            scenario_tokens = sum(self._count(text) for text in scenario_text)
+
+            if current and current_tokens + scenario_tokens > budget:
+                parts.append(current)
+                current, current_tokens = [], 0
+                # References must resolve inside the same prompt
+                if seen_blocks is not None:
+                    seen_blocks.clear()
+                    scenario_text = [processor.format_step(step, seen_blocks) for step in scenario]
+                    scenario_tokens = sum(self._count(text) for text in scenario_text)
+
+            for text in scenario_text:
+                tokens = self._count(text)
+                if current and current_tokens + tokens > budget:
+                    # A single scenario larger than the budget is split at step level
+                    parts.append(current)
+                    current, current_tokens = [], 0
+                current.append(text)
+                current_tokens += tokens
+            self.section_tokens["steps"] += scenario_tokens
+
+        if current or not parts:
+            parts.append(current)
+        return parts
+
+    def _assemble(self, preamble: str, parts: List[List[str]], continuation: bool = False,
+                  resume: bool = False) -> List[str]:
+        prompts = []
+        for index, steps in enumerate(parts):
+            prompt = preamble
+            if len(parts) > 1:
+                prompt += f"\n\n(Part {index + 1} of {len(parts)} of the same feature.)"
+                if index > 0 or continuation:
+                    prompt += " " + CONTINUATION_NOTE
+            elif continuation:
+                prompt += "\n\n" + CONTINUATION_NOTE
+            if resume and index == 0:
+                prompt += " " + RESUME_NOTE
+            prompt += "\n" + "\n".join(steps)
+            prompts.append(prompt)
+        return prompts
+
+    def build(self, processor: InstructionProcessor) -> List[str]:
+        """Build one or more prompts that each fit the context window"""
+        preamble = self._preamble(processor)
+        budget = self._budget(preamble)
+        return self._assemble(preamble, self._pack(processor, iter_scenarios(processor.iter_steps()), budget))
+
+    def _group_budget(self, processor: InstructionProcessor, group_tokens: Optional[int]) -> int:
+        budget = self._budget(self._preamble(processor))
+        return min(budget, group_tokens) if group_tokens else budget
+
+    def split_scenarios(self, processor: InstructionProcessor, scenarios: Iterable[List[Dict[str, Any]]],
+                        group_tokens: Optional[int] = None) -> List[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        Split scenarios into runs of steps, the unit of incremental regeneration
+
+        A run ends with its scenario, after a step whose formatted text hashes
+        to a boundary (about one in RUN_BOUNDARY_STEPS), or before a step that
+        would take it past group_tokens. Boundaries depend only on the steps
+        themselves, so editing one step changes the run around it and leaves
+        the others, and their recorded output, intact.
+        Returns (steps, continues the previous run's scenario) pairs.
+        """
+        budget = self._group_budget(processor, group_tokens)
+        runs: List[Tuple[List[Dict[str, Any]], bool]] = []
+        for scenario in scenarios:
+            current: List[Dict[str, Any]] = []
+            current_tokens = 0
+            continues = False
+            for step in scenario:
+                text = processor.format_step(step)
+                tokens = self._count(text)
+                if current and current_tokens + tokens > budget:
+                    runs.append((current, continues))
+                    current, current_tokens, continues = [], 0, True
+                current.append(step)
+                current_tokens += tokens
+                if zlib.crc32(text.encode("utf-8")) % RUN_BOUNDARY_STEPS == 0:
+                    runs.append((current, continues))
+                    current, current_tokens, continues = [], 0, True
+            if current:
+                runs.append((current, continues))
+        return runs
+
+    def group_scenarios(self, processor: InstructionProcessor, scenarios: List[List[Dict[str, Any]]],
+                        group_tokens: Optional[int] = None) -> List[List[int]]:
+        """
+        Pack scenarios (or runs from split_scenarios) into groups sent to the LLM together
+
+        Groups hold whole units and stay under group_tokens (capped at the
+        prompt budget), so a later change only regenerates its own group.
+        Returns the positions of each group's units.
+        """
+        budget = self._group_budget(processor, group_tokens)
+
+        groups: List[List[int]] = []
+        current_tokens = 0
+        for position, scenario in enumerate(scenarios):
+            tokens = sum(self._count(processor.format_step(step)) for step in scenario)
+            if groups and groups[-1] and current_tokens + tokens <= budget:
+                groups[-1].append(position)
+                current_tokens += tokens
+            else:
+                groups.append([position])
+                current_tokens = tokens
+        return groups
+
+    def build_group(self, processor: InstructionProcessor, scenarios: List[List[Dict[str, Any]]],
+                    continuation: bool = False, resume: bool = False) -> List[str]:
+        """
+        Build the prompts for one group of scenarios, optionally as a continuation of existing files
+
+        With resume, the group starts in the middle of a scenario begun by the previous group.
+        """
+        preamble = self._preamble(processor)
+        parts = self._pack(processor, scenarios, self._budget(preamble))
+        return self._assemble(preamble, parts, continuation, resume)
+
+def merge_file_sets(file_sets: List[Dict[str, str]]) -> Dict[str, str]:
+    """Merge per-part generated files into one file set
+
+    Later parts are continuations: feature files and step definitions are
+    appended, and page object fragments are inserted before the class's final
+    closing brace.
+    """
+    merged: Dict[str, str] = {}
+    for files in file_sets:
+        for filename, content in files.items():
+            if filename not in merged:
+                merged[filename] = content
+                continue
+
+            existing = merged[filename]
+            if filename.endswith('.feature'):
+                # Drop a repeated Feature header, keeping the new scenarios
+                content = re.sub(r'^\s*Feature:.*?(?=^\s*(Background|Scenario))', '',
+                                 content, count=1, flags=re.DOTALL | re.MULTILINE)
+                merged[filename] = existing.rstrip() + "\n\n" + content.strip("\n") + "\n"
+            elif filename.endswith('.page.ts') and '}' in existing:
+                closing = existing.rindex('}')
+                merged[filename] = (
+                    existing[:closing].rstrip() + "\n\n" + content.strip("\n") + "\n" + existing[closing:]
+                )
+            else:
+                new_imports = [
+                    line for line in content.splitlines()
+                    if line.startswith('import ') and line not in existing
+                ]
+                body = "\n".join(line for line in content.splitlines() if not line.startswith('import '))
+                merged[filename] = "\n".join(new_imports + [existing.rstrip(), "", body.strip("\n")]) + "\n"
+    return merged
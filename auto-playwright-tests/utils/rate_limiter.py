@@ -0,0 +1,247 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate adaptation
+
+    The refill rate is cut in half whenever the provider throttles us and
+    grows back gradually on success, never exceeding the configured rate.
+    Without a rate the bucket never limits, but still pauses callers while a
+    Retry-After hint is pending.
+    """
+
+    def __init__(self, rate_per_second: Optional[float], capacity: Optional[float] = None, min_rate: float = 0.05):
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.min_rate = min(min_rate, rate_per_second) if rate_per_second else None
+        self.capacity = capacity or max(1.0, rate_per_second or 1.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1) -> float:
+        """
+        Block until a request costing `cost` tokens may be sent; returns the seconds waited
+
+        A cost above the capacity waits for a full bucket and leaves it in debt,
+        so a large batch is charged in one go instead of one token at a time.
+        """
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                needed = min(cost, self.capacity)
+                if now >= self.blocked_until and (not self.rate or self.tokens >= needed):
+                    if self.rate:
+                        self.tokens -= cost
+                    return now - started
+                wait = self.blocked_until - now
+                if self.rate:
+                    wait = max(wait, (needed - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        if not self.rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Halve the rate and pause every caller until a Retry-After hint expires"""
+        with self._lock:
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring Retry-After hints"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (0-based)"""
+        if retry_after is not None:
+            # Never retry before the provider asked us to
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+def _exception_chain(error: BaseException):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+def _parse_retry_after(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(error: BaseException) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Inspect an exception (and its causes) from a provider call
+
+    Returns:
+        (retryable, throttled, retry_after_seconds)
+    """
+    status = None
+    retry_after = None
+    for err in _exception_chain(error):
+        response = getattr(err, "response", None)
+        status = status or getattr(err, "status_code", None) or getattr(response, "status_code", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None and retry_after is None:
+            retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = _parse_retry_after(getattr(err, "retry_after", None))
+
+    message = str(error).lower()
+    throttled = status == 429 or "rate_limit" in message or "rate limit" in message or "429" in message
+    if throttled:
+        return True, True, retry_after
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500, False, retry_after
+    # Unknown failures (timeouts, connection errors) are retried
+    return True, False, retry_after
+
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(provider: str, model: str, requests_per_minute: Optional[float], burst: float = 1) -> TokenBucket:
+    """Shared token bucket per provider and model; requests_per_minute None disables limiting"""
+    key = (provider, model)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate = requests_per_minute / 60.0 if requests_per_minute else None
+            bucket = _buckets[key] = TokenBucket(rate, capacity=burst)
+        return bucket
+
+class RetryScheduler:
+    """Runs provider calls through a shared rate limiter with jittered retries"""
+
+    def __init__(self, provider: str, config: Dict[str, Any]):
+        self.provider = provider
+        # Client-side limiting is opt-in; throttling by the provider is always honored
+        requests_per_minute = config.get("requests_per_minute")
+        self.requests_per_minute = float(requests_per_minute) if requests_per_minute else None
+        # Requests that may be sent back to back, at least one per concurrent slot
+        max_concurrency = int(config.get("max_concurrency", 4))
+        self.burst = float(max(config.get("burst", max_concurrency), max_concurrency, 1))
+        self.policy = RetryPolicy(
+            attempts=int(config.get("retry_attempts", 3)),
+            base_delay=float(config.get("retry_delay", 5)),
+            max_delay=float(config.get("max_retry_delay", 60))
+        )
+
+    def bucket(self, model: Optional[str]) -> TokenBucket:
+        return get_bucket(self.provider, model or "default", self.requests_per_minute, self.burst)
+
+    def run(self, call, model: Optional[str] = None, on_retry=None, cost: int = 1, on_wait=None):
+        """
+        Call `call()` once the rate limiter allows it, retrying retryable failures
+
+        Args:
+            call: Zero-argument callable performing one provider request
+            model: Model name used to select the rate limit bucket
+            on_retry: Optional callback(attempt, error, delay) invoked before sleeping
+            cost: Requests made by one call, e.g. the size of a batch
+            on_wait: Optional callback(seconds) invoked after waiting for the rate limiter
+        """
+        bucket = self.bucket(model)
+        for attempt in range(self.policy.attempts):
+            waited = bucket.acquire(max(1, cost))
+            if on_wait and waited:
+                on_wait(waited)
+            try:
+                result = call()
+            except Exception as e:
+                retryable, throttled, retry_after = classify_error(e)
+                if throttled:
+                    bucket.on_throttle(retry_after)
+                if not retryable or attempt == self.policy.attempts - 1:
+                    raise
+                delay = self.policy.delay(attempt, retry_after)
+                if on_retry:
+                    on_retry(attempt + 1, e, delay)
+                time.sleep(delay)
+            else:
+                bucket.on_success()
+                return result
+
+    def run_batch(self, call, count: int, model: Optional[str] = None, on_retry=None, on_wait=None) -> List[Any]:
+        """
+        Send `count` requests as batches, resubmitting only the ones that failed
+
+        Args:
+            call: Callable taking the indices to send and returning a result or exception for each
+            count: Number of requests in the batch
+            model: Model name used to select the rate limit bucket
+            on_retry: Optional callback(attempt, error, delay) invoked before sleeping
+            on_wait: Optional callback(seconds) invoked after waiting for the rate limiter
+        """
+        bucket = self.bucket(model)
+        results: List[Any] = [None] * count
+        pending = list(range(count))
+        for attempt in range(self.policy.attempts):
+            waited = bucket.acquire(len(pending))
+            if on_wait and waited:
+                on_wait(waited)
+            try:
+                outcomes = call(pending)
+            except Exception as e:
+                outcomes = [e] * len(pending)
+
+            failed = []
+            for index, outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    failed.append((index, outcome))
+                else:
+                    results[index] = outcome
+            if not failed:
+                bucket.on_success()
+                return results
+
+            # One verdict for the failed requests: fatal if any is, throttled if any was, latest Retry-After
+            error = failed[0][1]
+            retryable, throttled, retry_after = True, False, None
+            for _, failure in failed:
+                is_retryable, is_throttled, hint = classify_error(failure)
+                if not is_retryable and retryable:
+                    retryable, error = False, failure
+                throttled = throttled or is_throttled
+                if hint is not None:
+                    retry_after = max(retry_after or 0, hint)
+            if throttled:
+                bucket.on_throttle(retry_after)
+            if not retryable or attempt == self.policy.attempts - 1:
+                raise error
+            delay = self.policy.delay(attempt, retry_after)
+            if on_retry:
+                on_retry(attempt + 1, error, delay)
+            time.sleep(delay)
+            pending = [index for index, _ in failed]
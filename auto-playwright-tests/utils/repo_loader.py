@@ -1,52 +1,249 @@
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
-import re
+import hashlib
+import threading
+from .search_index import InvertedIndex, tokenize, query_tokens
+from .pattern_extractor import DEFAULT_REGISTRY
+
+SNAPSHOT_VERSION = 3
+LOAD_MODES = ('eager', 'lazy', 'prefetch')
+
+def _default_snapshot_path(repo_path: Path) -> Path:
+    """Snapshot location for a repo under the local cache directory"""
+    digest = hashlib.sha256(str(repo_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(".cache") / "repo_context" / f"{digest}.json"
+
+class LazyFileMap(Mapping):
+    """Read-only mapping of name to file content that reads each file on first access"""
+
+    def __init__(self, keys: Dict[str, str], loader: Callable[[str], str]):
+        self._keys = keys
+        self._loader = loader
+
+    def __getitem__(self, name: str) -> str:
+        return self._loader(self._keys[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
 
 class RepoContext:
-    def __init__(self, repo_path: str):
+    def __init__(self, repo_path: str, snapshot_path: str | Path | None = None, use_snapshot: bool = True,
+                 load_mode: str = 'eager', max_workers: int = 8):
+        """
+        Load repository context
+
+        Args:
+            repo_path: Root of the Playwright-Cucumber repository
+            snapshot_path: Optional location of the on-disk snapshot
+            use_snapshot: Reuse patterns of files whose mtime and size are
+                unchanged since the last load; the snapshot holds no file
+                bodies, so unchanged files are read only when their content
+                is needed
+            load_mode: 'eager' reads every file up front, 'lazy' reads file
+                bodies on first access, 'prefetch' reads them on a thread pool
+            max_workers: Thread pool size for 'prefetch' mode
+        """
+        if load_mode not in LOAD_MODES:
+            raise ValueError(f"Unsupported load mode: {load_mode}")
+
         self.repo_path = Path(repo_path)
+        self.use_snapshot = use_snapshot
+        self.load_mode = load_mode
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else _default_snapshot_path(self.repo_path)
+        self._snapshot = self._load_snapshot() if use_snapshot else {}
+        self._files = self._discover_files()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._patterns = None
+        self._index = None
+        self.changed_files: List[str] = []
+
+        if load_mode == 'prefetch':
+            self._prefetch(max_workers)
+
         self.base_page = self._load_base_page()
         self.page_objects = self._load_page_objects()
         self.step_definitions = self._load_step_definitions()
         self.features = self._load_features()
-        self.patterns = self._extract_patterns()
+
+        # The search index is built on the first query rather than here, so a
+        # warm load only pays for the files and patterns it has to re-read
+        if load_mode != 'lazy':
+            self.save_snapshot()
+
+    @property
+    def patterns(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Patterns extracted from the codebase (loads every file in lazy mode)"""
+        if self._patterns is None:
+            self._patterns = self._extract_patterns()
+            if self.load_mode == 'lazy':
+                # Every file is loaded at this point
+                self.save_snapshot()
+        return self._patterns
+
+    @property
+    def index(self) -> InvertedIndex:
+        """Inverted index used by find_similar_examples"""
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index
+
+    def _discover_files(self) -> Dict[str, Tuple[str, str, Path]]:
+        """List repo files in load order as {relative path: (kind, name, path)}"""
+        src = self.repo_path / 'src'
+        candidates = []
+        base_page_path = src / 'pages' / 'basepage.ts'
+        if base_page_path.exists():
+            candidates.append(('base_page', base_page_path))
+        if (src / 'pages').exists():
+            candidates.extend(
+                ('page_object', file) for file in (src / 'pages').glob('*.ts')
+                if file.name != 'basepage.ts'
+            )
+        if (src / 'step-definitions').exists():
+            candidates.extend(('step_definition', file) for file in (src / 'step-definitions').glob('*.ts'))
+        if (src / 'features').exists():
+            candidates.extend(('feature', file) for file in (src / 'features').glob('*.feature'))
+
+        return {
+            file.relative_to(self.repo_path).as_posix(): (kind, file.stem, file)
+            for kind, file in candidates
+        }
+
+    def _load_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Load the file snapshot from a previous run, if compatible"""
+        try:
+            data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != SNAPSHOT_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def save_snapshot(self):
+        """Persist metadata and extracted patterns of loaded files if anything changed"""
+        if not self.use_snapshot:
+            return
+        files = {
+            key: {field: value for field, value in (self._entries.get(key) or self._snapshot[key]).items()
+                  if field != "content"}
+            for key in self._files
+            if key in self._entries or key in self._snapshot
+        }
+        if not self.changed_files and set(files) == set(self._snapshot):
+            return
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"version": SNAPSHOT_VERSION, "files": files}),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _cached_entry(self, key: str, path: Path) -> Optional[Dict[str, Any]]:
+        """Return the snapshot entry for key if the file is unchanged on disk"""
+        cached = self._snapshot.get(key)
+        if not cached:
+            return None
+        stat = path.stat()
+        if cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            return dict(cached)
+        return None
+
+    def _scan_file(self, kind: str, name: str, path: Path) -> Dict[str, Any]:
+        """Read a file and extract its patterns; safe to call from worker threads"""
+        stat = path.stat()
+        content = path.read_text()
+        return {
+            "kind": kind,
+            "name": name,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "content": content,
+            "registry": DEFAULT_REGISTRY.fingerprint,
+            "patterns": self._extract_file_patterns(kind, name, content)
+        }
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        """Return the loaded entry for key, reading the file on first use"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                kind, name, path = self._files[key]
+                entry = self._cached_entry(key, path)
+                if entry is None:
+                    entry = self._scan_file(kind, name, path)
+                    self.changed_files.append(key)
+                elif entry.get("registry") != DEFAULT_REGISTRY.fingerprint:
+                    # Pattern specs were registered or changed since the snapshot: rescan the file
+                    entry = self._scan_file(kind, name, path)
+                    self.changed_files.append(key)
+                self._entries[key] = entry
+        return entry
+
+    def _content(self, key: str) -> str:
+        """Body of a file; unchanged files restored from the snapshot are read on first use"""
+        entry = self._entry(key)
+        content = entry.get("content")
+        if content is None:
+            kind, name, path = self._files[key]
+            content = path.read_text()
+            stat = path.stat()
+            if entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                # Edited since the snapshot check: patterns must follow the content we return
+                with self._lock:
+                    self._entries[key] = entry = self._scan_file(kind, name, path)
+                    self.changed_files.append(key)
+                content = entry["content"]
+            entry["content"] = content
+        return content
+
+    def _prefetch(self, max_workers: int):
+        """Read every file on a thread pool, scanning the changed ones"""
+        stale = [key for key, (_, _, path) in self._files.items() if self._cached_entry(key, path) is None]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            scanned = executor.map(lambda key: self._scan_file(*self._files[key]), stale)
+            for key, entry in zip(stale, scanned):
+                self._entries[key] = entry
+                self.changed_files.append(key)
+            list(executor.map(self._content, self._files))
+
+    def _file_map(self, kind: str) -> Mapping[str, str]:
+        """Name to content mapping for one kind of file, lazy in lazy mode"""
+        keys = {name: key for key, (file_kind, name, _) in self._files.items() if file_kind == kind}
+        if self.load_mode == 'lazy':
+            return LazyFileMap(keys, self._content)
+        return {name: self._content(key) for name, key in keys.items()}
 
     def _load_base_page(self) -> str:
         """Load BasePage implementation"""
-        base_page_path = self.repo_path / 'src' / 'pages' / 'basepage.ts'
-        if base_page_path.exists():
-            return base_page_path.read_text()
+        for key, (kind, _, _) in self._files.items():
+            if kind == 'base_page':
+                return self._content(key)
         return ""
 
-    def _load_page_objects(self) -> Dict[str, str]:
+    def _load_page_objects(self) -> Mapping[str, str]:
         """Load all page objects"""
-        page_objects = {}
-        page_dir = self.repo_path / 'src' / 'pages'
-        if page_dir.exists():
-            for file in page_dir.glob('*.ts'):
-                if file.name != 'basepage.ts':
-                    page_objects[file.stem] = file.read_text()
-        return page_objects
-
-    def _load_step_definitions(self) -> Dict[str, str]:
+        return self._file_map('page_object')
+
+    def _load_step_definitions(self) -> Mapping[str, str]:
         """Load all step definitions"""
-        steps = {}
-        steps_dir = self.repo_path / 'src' / 'step-definitions'
-        if steps_dir.exists():
-            for file in steps_dir.glob('*.ts'):
-                steps[file.stem] = file.read_text()
-        return steps
-
-    def _load_features(self) -> Dict[str, str]:
+        return self._file_map('step_definition')
+
+    def _load_features(self) -> Mapping[str, str]:
         """Load all feature files"""
-        features = {}
-        feature_dir = self.repo_path / 'src' / 'features'
-        if feature_dir.exists():
-            for file in feature_dir.glob('*.feature'):
-                features[file.stem] = file.read_text()
-        return features
+        return self._file_map('feature')
 
     def _extract_patterns(self) -> Dict[str, List[Dict[str, Any]]]:
         """Extract common patterns from codebase"""
@@ -56,50 +253,25 @@ class RepoContext:
             'step_definitions': [],
             'error_handling': []
         }
-
-        # Extract response handling patterns
-        for _, content in self.step_definitions.items():
-            response_patterns = re.finditer(
-                r'(waitForResponse|getResponsePromise).*?\{.*?\}',
-                content,
-                re.DOTALL
-            )
-            for match in response_patterns:
-                patterns['response_handling'].append({
-                    'type': 'response',
-                    'pattern': match.group(0).strip()
-                })
-
-        # Extract page object patterns
-        for name, content in self.page_objects.items():
-            locator_patterns = re.finditer(
-                r'private\s+readonly\s+locators\s*=\s*\{.*?\};',
-                content,
-                re.DOTALL
-            )
-            for match in locator_patterns:
-                patterns['page_objects'].append({
-                    'type': 'locators',
-                    'name': name,
-                    'pattern': match.group(0).strip()
-                })
-
-        # Extract error handling patterns
-        error_patterns = re.finditer(
-            r'try\s*\{.*?catch\s*\(.*?\)\s*\{.*?\}',
-            self.base_page,
-            re.DOTALL
-        )
-        for match in error_patterns:
-            patterns['error_handling'].append({
-                'type': 'error',
-                'pattern': match.group(0).strip()
-            })
-
+        for pattern_type in DEFAULT_REGISTRY.pattern_types:
+            patterns.setdefault(pattern_type, [])
+        for key in self._files:
+            for pattern_type, found in self._entry(key)["patterns"].items():
+                patterns.setdefault(pattern_type, []).extend(found)
         return patterns
 
+    def _extract_file_patterns(self, kind: str, name: str, content: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Extract patterns from a single file"""
+        return DEFAULT_REGISTRY.extract(kind, name, content)
+
     def get_context(self) -> Dict[str, any]:
-        """Get structured context from the repo"""
+        """
+        Get structured context from the repo
+
+        In lazy mode file sections are LazyFileMap views, but building
+        patterns still reads every file; callers that only need a few files
+        should index page_objects/step_definitions/features directly.
+        """
         return {
             "base_page": self.base_page,
             "page_objects": self.page_objects,
@@ -108,53 +280,55 @@ class RepoContext:
             "patterns": self.patterns
         }
 
-    def find_similar_examples(self, pattern: str, pattern_type: Optional[str] = None) -> List[Dict[str, str]]:
-        """Find similar examples in existing code"""
-        examples = []
-        
-        # If pattern type specified, only search in those patterns
-        if pattern_type and pattern_type in self.patterns:
-            for p in self.patterns[pattern_type]:
-                if pattern.lower() in p['pattern'].lower():
-                    examples.append({
-                        "type": pattern_type,
-                        "pattern": p['pattern']
-                    })
-            return examples
-
-        # Search in all patterns
+    def _build_index(self) -> InvertedIndex:
+        """Index patterns, step definitions and page objects for example lookup"""
+        index = InvertedIndex()
         for pattern_type, patterns in self.patterns.items():
             for p in patterns:
-                if pattern.lower() in p['pattern'].lower():
-                    examples.append({
-                        "type": pattern_type,
-                        "pattern": p['pattern']
-                    })
-        
-        # Search in step definitions
+                index.add(p['pattern'], {"type": pattern_type, "pattern": p['pattern']})
         for name, content in self.step_definitions.items():
-            if pattern.lower() in content.lower():
-                examples.append({
-                    "type": "step_definition",
-                    "file": name,
-                    "content": content
-                })
-        
-        # Search in page objects
+            index.add(content, {"type": "step_definition", "file": name})
         for name, content in self.page_objects.items():
-            if pattern.lower() in content.lower():
-                examples.append({
-                    "type": "page_object",
-                    "file": name,
-                    "content": content
-                })
-        
+            index.add(content, {"type": "page_object", "file": name})
+        return index
+
+    def _snippet(self, content: str, query: str, context_lines: int = 2) -> str:
+        """Return the lines around the best match for query in content"""
+        wanted = query_tokens(query)
+        lines = content.splitlines()
+        best_line, best_hits = 0, 0
+        for number, line in enumerate(lines):
+            hits = len(wanted.intersection(tokenize(line)))
+            if hits > best_hits:
+                best_line, best_hits = number, hits
+        start = max(0, best_line - context_lines)
+        return "\n".join(lines[start:best_line + context_lines + 1])
+
+    def find_similar_examples(self, pattern: str, pattern_type: Optional[str] = None, top_k: int = 10) -> List[Dict[str, str]]:
+        """
+        Find similar examples in existing code, best matches first
+
+        Patterns are returned whole; step definition and page object hits
+        return the excerpt around the match rather than the full file.
+        """
+        doc_filter = None
+        if pattern_type and pattern_type in self.patterns:
+            doc_filter = lambda document: document["type"] == pattern_type
+
+        examples = []
+        for document, score in self.index.search(pattern, top_k=top_k, doc_filter=doc_filter):
+            example = dict(document)
+            if "file" in example:
+                sources = self.step_definitions if example["type"] == "step_definition" else self.page_objects
+                example["content"] = self._snippet(sources[example["file"]], pattern)
+            example["score"] = round(score, 4)
+            examples.append(example)
         return examples
 
-def load_repo_context(repo_path: str) -> RepoContext:
+def load_repo_context(repo_path: str, use_snapshot: bool = True, load_mode: str = 'eager') -> RepoContext:
     """Load repository context"""
-    return RepoContext(repo_path)
+    return RepoContext(repo_path, use_snapshot=use_snapshot, load_mode=load_mode)
 
-def find_examples(context: RepoContext, pattern: str, pattern_type: Optional[str] = None) -> List[Dict[str, str]]:
+def find_examples(context: RepoContext, pattern: str, pattern_type: Optional[str] = None, top_k: int = 10) -> List[Dict[str, str]]:
     """Find examples matching a pattern"""
-    return context.find_similar_examples(pattern, pattern_type)
\ No newline at end of file
+    return context.find_similar_examples(pattern, pattern_type, top_k=top_k)
\ No newline at end of file
@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_FILENAME = "test.spec.ts"
+
+class FencedBlockParser:
+    """Incremental parser for fenced file blocks in an LLM response
+
+    Blocks look like ```typescript:login.page.ts ... ```. Text can be fed in
+    arbitrary chunks; each file is returned as soon as its closing fence is
+    seen, so only the current partial line and the open block are buffered.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._current_file: Optional[str] = None
+        self._current_content: List[str] = []
+        self._emitted = 0
+        # Full text is only kept until the first file block completes, for the
+        # single-file fallback when the response has no fenced file blocks
+        self._raw: Optional[List[str]] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of response text and return any completed files"""
+        if self._raw is not None:
+            self._raw.append(chunk)
+
+        data = self._pending + chunk
+        lines = data.split('\n')
+        self._pending = lines.pop()
+
+        completed = []
+        for line in lines:
+            result = self._process_line(line)
+            if result:
+                completed.append(result)
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush the final line; return the fallback file if nothing was parsed"""
+        completed = []
+        result = self._process_line(self._pending)
+        self._pending = ""
+        if result:
+            completed.append(result)
+
+        if not self._emitted and self._raw is not None:
+            completed.append((DEFAULT_FILENAME, "".join(self._raw)))
+        self._raw = None
+        return completed
+
+    def _process_line(self, line: str) -> Optional[Tuple[str, str]]:
+        if line.startswith('```') and len(line) > 3:
+            # New file block
+            file_info = line[3:].strip()
+            if ':' in file_info:
+                self._current_file = file_info.split(':')[1].strip()
+                self._current_content = []
+        elif line.startswith('```') and self._current_file:
+            # End of file block
+            completed = (self._current_file, '\n'.join(self._current_content))
+            self._current_file = None
+            self._current_content = []
+            self._emitted += 1
+            self._raw = None
+            return completed
+        elif self._current_file:
+            self._current_content.append(line)
+        return None
+
+def iter_files(chunks: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (filename, content) pairs as their blocks complete in a chunk stream"""
+    parser = FencedBlockParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+def parse_files(response: str) -> Dict[str, str]:
+    """Parse a complete response into a mapping of filename to content"""
+    return dict(iter_files([response]))
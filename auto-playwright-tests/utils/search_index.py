@@ -0,0 +1,84 @@
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Any, Set, Tuple
+
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+_CAMEL_RE = re.compile(r'[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])')
+
+def _word_parts(word: str) -> List[str]:
+    return [part.lower() for piece in word.split('_') for part in _CAMEL_RE.findall(piece)]
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, including camelCase/snake_case parts"""
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        tokens.append(word.lower())
+        parts = _word_parts(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+def query_tokens(text: str) -> Set[str]:
+    """Tokens a document must contain to match a query; compound words match by their parts"""
+    tokens = set()
+    for word in _WORD_RE.findall(text):
+        parts = _word_parts(word)
+        tokens.update(parts if len(parts) > 1 else [word.lower()])
+    return tokens
+
+class InvertedIndex:
+    """Token inverted index with TF-IDF ranking
+
+    Documents are added once; lookups only touch the posting lists of the
+    query tokens, so their cost does not grow with total document size.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._docs: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, text: str, document: Dict[str, Any]) -> int:
+        """Index text under a document payload and return its id"""
+        doc_id = len(self._docs)
+        self._docs.append(document)
+        postings = self._postings
+        for token in tokenize(text):
+            doc_tf = postings[token]
+            doc_tf[doc_id] = doc_tf.get(doc_id, 0) + 1
+        return doc_id
+
+    def search(self, query: str, top_k: int = 10, doc_filter=None) -> List[Tuple[Dict[str, Any], float]]:
+        """Return up to top_k (document, score) pairs containing every query token"""
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+
+        posting_lists = [self._postings.get(token) for token in tokens]
+        if not all(posting_lists):
+            return []
+
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for postings in posting_lists[1:]:
+            candidates &= postings.keys()
+            if not candidates:
+                return []
+
+        total = len(self._docs)
+        scored = []
+        for doc_id in candidates:
+            document = self._docs[doc_id]
+            if doc_filter and not doc_filter(document):
+                continue
+            score = sum(
+                (1 + math.log(postings[doc_id])) * math.log(1 + total / len(postings))
+                for postings in posting_lists
+            )
+            scored.append((score, doc_id))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self._docs[doc_id], score) for score, doc_id in scored[:top_k]]
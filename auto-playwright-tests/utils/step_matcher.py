@@ -0,0 +1,171 @@
+import re
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+# Given/When/Then('expression' | "expression" | `expression` | /regex/flags, ...)
+_STEP_DEFINITION = re.compile(r'''
+    \b(?:Given|When|Then|defineStep|Step)\s*\(\s*
+    (?:
+        (?P<quote>["'`])(?P<expression>(?:\\.|(?!(?P=quote))[^\\])*)(?P=quote)
+      | /(?P<regex>(?:\\.|\[(?:\\.|[^\]\\])*\]|[^/\\\n])+)/(?P<flags>[a-z]*)
+    )
+''', re.VERBOSE)
+
+_JS_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+_STEP_KEYWORD = re.compile(r'^\s*(?:given|when|then|and|but|\*)\s+', re.IGNORECASE)
+
+# Regexes for the built-in Cucumber expression parameter types
+PARAMETER_TYPES = {
+    'int': r'-?\d+',
+    'float': r'-?(?:\d+\.?\d*|\.\d+)',
+    'double': r'-?(?:\d+\.?\d*|\.\d+)',
+    'word': r'[^\s]+',
+    'string': r'"[^"]*"|\'[^\']*\'',
+    '': r'.*',
+}
+# Custom parameter types are registered in code we do not evaluate; match anything
+_CUSTOM_PARAMETER = r'.+'
+
+# Cucumber expression tokens: parameters, optional text, escapes, whitespace and text
+_EXPRESSION_TOKEN = re.compile(r'(?P<param>\{[^{}]*\})|(?P<optional>\((?:\\.|[^()\\])*\))|(?P<escape>\\.)|(?P<space>\s+)|(?P<text>[^{}()\\\s]+|.)')
+
+def normalize_step(text: str) -> str:
+    """Step text without its Gherkin keyword and with whitespace collapsed"""
+    return " ".join(_STEP_KEYWORD.sub('', text).split())
+
+def _collapse(expression: str) -> str:
+    return " ".join(expression.split())
+
+def iter_step_definitions(content: str) -> Iterator[Tuple[str, bool, str]]:
+    """Yield (expression or regex, is_regex, regex flags) for each step definition in a TypeScript source"""
+    for match in _STEP_DEFINITION.finditer(content):
+        if match.group('regex') is not None:
+            yield match.group('regex'), True, match.group('flags')
+        else:
+            yield _JS_ESCAPE.sub(r'\1', match.group('expression')), False, ''
+
+def _alternation(text: str) -> str:
+    """Regex for a text token, where a/b matches either word"""
+    if '/' not in text or text.strip('/') != text:
+        return re.escape(text)
+    return '(?:' + '|'.join(re.escape(part) for part in text.split('/')) + ')'
+
+def compile_expression(expression: str) -> Optional[str]:
+    """
+    Translate a Cucumber expression into a regex pattern
+
+    Returns None when the expression has no parameters, optional text or
+    alternatives, so it can be matched by plain string comparison.
+    """
+    parts = []
+    literal = True
+    for token in _EXPRESSION_TOKEN.finditer(_collapse(expression)):
+        kind, value = token.lastgroup, token.group()
+        if kind == 'param':
+            parts.append(f"(?:{PARAMETER_TYPES.get(value[1:-1].strip(), _CUSTOM_PARAMETER)})")
+            literal = False
+        elif kind == 'optional':
+            optional = _JS_ESCAPE.sub(r'\1', value[1:-1])
+            parts.append(f"(?:{re.escape(optional)})?")
+            literal = False
+        elif kind == 'escape':
+            parts.append(re.escape(value[1]))
+        elif kind == 'space':
+            parts.append(r'\s+')
+        else:
+            pattern = _alternation(value)
+            literal = literal and pattern == re.escape(value)
+            parts.append(pattern)
+    return None if literal else "".join(parts)
+
+def _literal_prefix(expression: str) -> Tuple[str, ...]:
+    """Leading whole words of an expression that are plain text, used to index its pattern"""
+    words: List[str] = []
+    word = ""
+    for token in _EXPRESSION_TOKEN.finditer(_collapse(expression)):
+        kind, value = token.lastgroup, token.group()
+        if kind == 'space':
+            words.append(word)
+            word = ""
+        elif kind == 'escape':
+            word += value[1]
+        elif kind == 'text' and _alternation(value) == re.escape(value):
+            word += value
+        else:
+            break
+    return tuple(words)
+
+class StepMatcher:
+    """Classify instruction steps as implemented by existing step definitions or new
+
+    Definitions without parameters are looked up in a dictionary. Cucumber
+    expressions with parameters are indexed by the words before their first
+    parameter, and the expressions sharing a prefix are compiled into one
+    alternation regex, so a step is only tried against the few patterns whose
+    prefix it starts with. Raw regex definitions, which may use their own groups
+    and anchors, are tried one by one.
+    """
+
+    def __init__(self, step_definitions: Mapping[str, str]):
+        self.literals: Dict[str, str] = {}
+        self._expressions: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}
+        self._regexes: List[Tuple[re.Pattern, str]] = []
+        self._buckets: Dict[Tuple[str, ...], Tuple[re.Pattern, List[str]]] = {}
+        self._results: Dict[str, Optional[str]] = {}
+        self.definitions = 0
+
+        for name, content in step_definitions.items():
+            for expression, is_regex, flags in iter_step_definitions(content):
+                self.add(expression, name, is_regex, flags)
+
+    def add(self, expression: str, source: str, is_regex: bool = False, flags: str = ''):
+        """Register one step definition from source"""
+        self.definitions += 1
+        self._results.clear()
+        self._buckets.clear()
+        if is_regex:
+            try:
+                pattern = re.compile(expression, re.IGNORECASE if 'i' in flags else 0)
+            except re.error:
+                return
+            self._regexes.append((pattern, source))
+            return
+        pattern = compile_expression(expression)
+        if pattern is None:
+            self.literals.setdefault(_collapse(expression), source)
+        else:
+            self._expressions.setdefault(_literal_prefix(expression), []).append((pattern, source))
+
+    def _bucket(self, prefix: Tuple[str, ...]) -> Optional[Tuple[re.Pattern, List[str]]]:
+        """Alternation of every parameterised expression with this literal prefix, compiled on first use"""
+        if prefix not in self._buckets:
+            expressions = self._expressions.get(prefix)
+            if not expressions:
+                return None
+            alternation = "|".join(f"(?P<e{index}>{pattern})" for index, (pattern, _) in enumerate(expressions))
+            self._buckets[prefix] = (re.compile(alternation), [source for _, source in expressions])
+        return self._buckets[prefix]
+
+    def match(self, step: str) -> Optional[str]:
+        """Name of the step definition file implementing step, or None if it is new"""
+        text = normalize_step(step)
+        if text in self._results:
+            return self._results[text]
+
+        source = self.literals.get(text)
+        if source is None:
+            # Longest literal prefix first, down to expressions that start with a parameter
+            words = tuple(text.split(' '))
+            for length in range(len(words) - 1, -1, -1):
+                bucket = self._bucket(words[:length])
+                found = bucket and bucket[0].fullmatch(text)
+                if found:
+                    source = bucket[1][int(found.lastgroup[1:])]
+                    break
+        if source is None:
+            source = next((name for pattern, name in self._regexes if pattern.search(text)), None)
+
+        self._results[text] = source
+        return source
+
+    def __len__(self) -> int:
+        return self.definitions
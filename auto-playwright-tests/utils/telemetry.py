@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Attributes summed per stage in the summary table
+SUMMED_ATTRIBUTES = ('prompt_tokens', 'cached_tokens', 'completion_tokens', 'retries', 'cache_hits', 'limiter_wait_ms', 'files')
+
+# Spans wrapping a single provider request
+PROVIDER_SPANS = ('llm.generate_completion', 'llm.generate_completions', 'llm.generate_test_stream')
+
+_local = threading.local()
+# report_usage may be called from several threads sharing one span
+_usage_lock = threading.Lock()
+
+def _stack() -> List[Dict[str, Any]]:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def current_span() -> Optional[Dict[str, Any]]:
+    """Attributes of the innermost open span on this thread, if any"""
+    stack = _stack()
+    return stack[-1]['attributes'] if stack else None
+
+def current_frame() -> Optional[Dict[str, Any]]:
+    """Innermost open span frame on this thread, to be continued on another thread"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+@contextmanager
+def continue_span(frame: Optional[Dict[str, Any]]) -> Iterator[None]:
+    """Make a span opened on another thread current on this one, so usage reported here lands in it"""
+    if frame is None:
+        yield
+        return
+    stack = _stack()
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is frame:
+                del stack[index]
+                break
+
+def report_usage(prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                 cached_tokens: Optional[int] = None):
+    """
+    Attach provider-reported token usage to the current span
+
+    Args:
+        prompt_tokens: All input tokens, including those read from the prompt cache
+        completion_tokens: Output tokens
+        cached_tokens: Input tokens served from the provider's prompt prefix cache
+    """
+    span = current_span()
+    if span is None:
+        return
+    with _usage_lock:
+        if prompt_tokens is not None:
+            span['prompt_tokens'] = span.get('prompt_tokens', 0) + prompt_tokens
+        if completion_tokens is not None:
+            span['completion_tokens'] = span.get('completion_tokens', 0) + completion_tokens
+        if cached_tokens is not None:
+            span['cached_tokens'] = span.get('cached_tokens', 0) + cached_tokens
+
+class Telemetry:
+    """Collects timed spans for a generation run
+
+    Spans nest per thread; each record carries its parent path and inherits the
+    nearest ancestor's feature attribute so cost can be tracked per feature.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict[str, Any]]:
+        """Time a stage; the yielded dict can be updated with extra attributes"""
+        if not self.enabled:
+            yield dict(attributes)
+            return
+
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        if parent and 'feature' not in attributes and 'feature' in parent['attributes']:
+            attributes['feature'] = parent['attributes']['feature']
+        frame = {
+            'name': name,
+            'path': f"{parent['path']}/{name}" if parent else name,
+            'attributes': attributes,
+        }
+        stack.append(frame)
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            # Remove this frame even if a generator's span closed out of order
+            for index in range(len(stack) - 1, -1, -1):
+                if stack[index] is frame:
+                    del stack[index]
+                    break
+            record = {
+                'span': name,
+                'path': frame['path'],
+                'start': started,
+                'duration_ms': round(duration_ms, 3),
+                **attributes,
+            }
+            if error:
+                record['error'] = error
+            with self._lock:
+                self.records.append(record)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Remove and return every recorded span, so long-running processes do not accumulate them"""
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def export_jsonl(self, path: str | Path, records: Optional[List[Dict[str, Any]]] = None):
+        """Append every recorded span (or the given records) to a JSON lines file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if records is None:
+            with self._lock:
+                records = list(self.records)
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Aggregate spans by path: count, total/p50/max latency and summed counters"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for record in self.records:
+                groups.setdefault(record['path'], []).append(record)
+
+        rows = []
+        for path, records in groups.items():
+            durations = sorted(record['duration_ms'] for record in records)
+            row = {
+                'stage': path,
+                'count': len(records),
+                'total_ms': round(sum(durations), 1),
+                'p50_ms': round(durations[len(durations) // 2], 1),
+                'max_ms': round(durations[-1], 1),
+                'errors': sum(1 for record in records if 'error' in record),
+            }
+            for attribute in SUMMED_ATTRIBUTES:
+                row[attribute] = sum(record.get(attribute, 0) or 0 for record in records)
+            rows.append(row)
+        return rows
+
+    def prompt_cache_summary(self) -> Optional[Dict[str, Any]]:
+        """Prompt prefix cache hit rate over provider requests, or None if no provider reported it"""
+        with self._lock:
+            records = [record for record in self.records if record['span'] in PROVIDER_SPANS]
+        if not any('cached_tokens' in record for record in records):
+            return None
+        prompt_tokens = sum(record.get('prompt_tokens', 0) or 0 for record in records)
+        cached_tokens = sum(record.get('cached_tokens', 0) or 0 for record in records)
+        return {
+            'requests': len(records),
+            'requests_hit': sum(1 for record in records if record.get('cached_tokens')),
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'hit_rate': cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        }
+
+    def summary_table(self) -> str:
+        """Render the summary as a plain text table"""
+        rows = self.summary()
+        if not rows:
+            return "No spans recorded"
+        columns = ['stage', 'count', 'total_ms', 'p50_ms', 'max_ms', 'errors'] + list(SUMMED_ATTRIBUTES)
+        widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+        lines = [
+            "  ".join(column.ljust(widths[column]) for column in columns),
+            "  ".join("-" * widths[column] for column in columns),
+        ]
+        for row in rows:
+            lines.append("  ".join(
+                str(row[column]).ljust(widths[column]) if column == 'stage' else str(row[column]).rjust(widths[column])
+                for column in columns
+            ))
+
+        cache = self.prompt_cache_summary()
+        if cache:
+            lines.append("")
+            lines.append(
+                f"Prompt cache: {cache['cached_tokens']} of {cache['prompt_tokens']} prompt tokens "
+                f"({cache['hit_rate']:.0%}) read from cache; "
+                f"{cache['requests_hit']} of {cache['requests']} requests hit"
+            )
+        return "\n".join(lines)
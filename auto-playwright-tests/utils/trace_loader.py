@@ -0,0 +1,203 @@
+import base64
+import csv
+import glob
+import json
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Columns of a CSV instruction sheet, as read by InstructionProcessor._load_csv
+CSV_COLUMNS = [
+    'step_description', 'api_endpoint', 'api_method', 'api_status', 'response_key',
+    'response_template', 'validation_type', 'validation_value', 'validation_selector',
+    'validation_assertion', 'test_data_source', 'test_data_field'
+]
+
+# Requests for these paths are page assets, not API calls
+_STATIC_ASSET = re.compile(r'\.(?:js|mjs|css|map|json|html?|png|jpe?g|gif|svg|ico|webp|woff2?|ttf|otf|eot)$', re.I)
+# Path segments that identify one record rather than an endpoint
+_ID_SEGMENT = re.compile(r'^(?:\d+|[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$', re.I)
+
+DEFAULT_OPTIONS = {
+    'include': None,            # Regex an endpoint path must match
+    'collapse_ids': True,       # /api/users/42 and /api/users/43 become /api/users/*
+    'max_body_bytes': 65536,    # Larger response bodies are emitted without a template
+    'max_entry_bytes': 8 * 1024 * 1024,  # Larger network entries are skipped unread
+}
+
+def find_trace_files(traces: str) -> List[Path]:
+    """Resolve a trace zip, directory or glob pattern into a sorted list of trace zips"""
+    path = Path(traces)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(traces, recursive=True))
+    return sorted(p for p in candidates if p.is_file() and p.suffix.lower() == '.zip')
+
+def _iter_lines(stream, max_bytes: int) -> Iterator[bytes]:
+    """Yield lines of a binary stream, skipping lines longer than max_bytes without holding them"""
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_bytes and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_bytes + 1)
+            continue
+        yield line
+
+def iter_network_entries(archive: zipfile.ZipFile, max_entry_bytes: int) -> Iterator[Dict[str, Any]]:
+    """
+    Stream HAR-style entries from every *.network member of a trace archive
+
+    Members are decompressed incrementally and read one JSON line at a time, so
+    memory use does not grow with the size of the trace.
+    """
+    for name in archive.namelist():
+        if not name.endswith('.network'):
+            continue
+        with archive.open(name) as stream:
+            for line in _iter_lines(stream, max_entry_bytes):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get('type') == 'resource-snapshot' and isinstance(event.get('snapshot'), dict):
+                    yield event['snapshot']
+
+def endpoint_path(url: str, collapse_ids: bool = True) -> str:
+    """URL path used as the interception endpoint, with record ids optionally collapsed"""
+    path = urlsplit(url).path or '/'
+    if collapse_ids:
+        path = '/'.join('*' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+    return path
+
+def response_key(endpoint: str) -> str:
+    """camelCase key for an endpoint, e.g. /api/auth/login -> loginResponse"""
+    segments = [s for s in endpoint.split('/') if s and s != '*']
+    words = re.split(r'[^A-Za-z0-9]+', segments[-1] if segments else 'root')
+    words = [w for w in words if w] or ['root']
+    return words[0].lower() + ''.join(w.title() for w in words[1:]) + 'Response'
+
+def _is_api_call(entry: Dict[str, Any], method: str, path: str) -> bool:
+    """Fetch/XHR calls, JSON responses and form submissions, excluding page assets"""
+    response = entry.get('response') or {}
+    if not isinstance(response.get('status'), int) or response['status'] <= 0:
+        return False
+    mime_type = ((response.get('content') or {}).get('mimeType') or '').lower()
+    if method != 'GET' or entry.get('_resourceType') in ('xhr', 'fetch') or 'json' in mime_type:
+        return not _STATIC_ASSET.search(path)
+    return False
+
+def _read_body(archive: zipfile.ZipFile, content: Dict[str, Any], max_bytes: int) -> Optional[bytes]:
+    """Response body stored inline or under resources/, or None if missing or too large"""
+    if content.get('size', 0) > max_bytes:
+        return None
+    if content.get('text') is not None:
+        text = content['text']
+        body = base64.b64decode(text) if content.get('encoding') == 'base64' else text.encode('utf-8')
+        return body if len(body) <= max_bytes else None
+    sha1 = content.get('_sha1')
+    if not sha1:
+        return None
+    try:
+        with archive.open(f"resources/{sha1}") as stream:
+            body = stream.read(max_bytes + 1)
+    except KeyError:
+        return None
+    return body if len(body) <= max_bytes else None
+
+def _response_template(body: Optional[bytes]) -> str:
+    if not body:
+        return ''
+    try:
+        return json.dumps(json.loads(body), separators=(',', ':'), ensure_ascii=False)
+    except ValueError:
+        return ''
+
+def load_trace(trace_path: str | Path, options: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """
+    Extract unique API interceptions from one Playwright trace zip
+
+    Returns:
+        {"trace", "entries", "api_calls", "interceptions"} where interceptions are
+        dicts with endpoint, method, status and response_template, one per
+        (method, endpoint, status) in first-seen order.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    include = re.compile(options['include']) if options.get('include') else None
+    seen: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+    entries = api_calls = 0
+
+    with zipfile.ZipFile(trace_path) as archive:
+        for entry in iter_network_entries(archive, options['max_entry_bytes']):
+            entries += 1
+            request = entry.get('request') or {}
+            method = request.get('method', 'GET').upper()
+            path = endpoint_path(request.get('url', ''), options['collapse_ids'])
+            if not _is_api_call(entry, method, path) or (include and not include.search(path)):
+                continue
+            api_calls += 1
+            response = entry['response']
+            key = (method, path, response['status'])
+            if key in seen and seen[key]['response_template']:
+                continue
+            # A repeated call may carry the body the first one lacked
+            seen[key] = {
+                'endpoint': path,
+                'method': method,
+                'status': key[2],
+                'response_template': _response_template(
+                    _read_body(archive, response.get('content') or {}, options['max_body_bytes'])
+                ),
+            }
+
+    return {
+        'trace': str(trace_path),
+        'entries': entries,
+        'api_calls': api_calls,
+        'interceptions': list(seen.values()),
+    }
+
+def load_traces(trace_paths: List[Path], options: Dict[str, Any] | None = None,
+                max_workers: int | None = None) -> List[Dict[str, Any]]:
+    """Run load_trace over many traces, in separate processes when there is more than one"""
+    if len(trace_paths) <= 1 or max_workers == 1:
+        return [load_trace(path, options) for path in trace_paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_trace, trace_paths, [options] * len(trace_paths)))
+
+def interception_rows(results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """CSV instruction rows for the interceptions of all traces, deduplicated across traces"""
+    rows = {}
+    for result in results:
+        for interception in result['interceptions']:
+            key = (interception['method'], interception['endpoint'], interception['status'])
+            if key in rows and rows[key]['response_template']:
+                continue
+            row = dict.fromkeys(CSV_COLUMNS, '')
+            row.update({
+                'step_description': f"When the app calls {interception['method']} {interception['endpoint']}",
+                'api_endpoint': interception['endpoint'],
+                'api_method': interception['method'],
+                'api_status': str(interception['status']),
+                'response_key': response_key(interception['endpoint']),
+                'response_template': interception['response_template'],
+            })
+            rows[key] = row
+    return list(rows.values())
+
+def write_interceptions_csv(rows: List[Dict[str, str]], path: str | Path) -> Path:
+    """Write rows as a CSV instruction sheet"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path